@@ -0,0 +1,172 @@
+# ------------------------------------------------------------
+# PatitoBatch.py
+#
+# Compile and run many programs in Patito Language with a pool of processes
+# ------------------------------------------------------------
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from PatitoLimits import PatitoLimitError, PatitoLimits
+from PatitoOptimizer import PatitoOptimizer
+from PatitoParser import get_parser
+from PatitoProgram import PatitoCompileError, compile
+from PatitoVirtualMachine import PatitoVirtualMachine, read_file
+
+class BatchResult(object):
+
+    def __init__(self, path, output = '', variables = None, executed_quads = 0, elapsed = 0.0, error = None):
+        self.path = path
+        # Text printed by the program
+        self.output = output
+        # Final value of every variable by name
+        self.variables = variables or {}
+        self.executed_quads = executed_quads
+        # Seconds spent compiling and running the program
+        self.elapsed = elapsed
+        # Message of the compiler or the Virtual Machine, None if the program ran
+        self.error = error
+
+    def __repr__(self):
+        return 'BatchResult(%r, error=%r)' % (self.path, self.error)
+
+# Options of the worker, set once when the process starts
+worker_options = {}
+
+# Prepare a worker: build the parser once for all the programs of the process
+def init_worker(engine, optimizations, limits = None):
+    worker_options['engine'] = engine
+    worker_options['optimizations'] = optimizations
+    worker_options['limits'] = limits
+    get_parser()
+
+# Compile and run a program. Errors are returned in the result, they never stop the batch.
+def run_program(path):
+    start = time.perf_counter()
+    try:
+        source = read_file(path)
+        # The compiler prints its errors, they are kept in the result instead
+        with contextlib.redirect_stdout(io.StringIO()):
+            program = compile(source, worker_options.get('optimizations', ()))
+        result = program.run(worker_options.get('engine', 'loop'), limits=worker_options.get('limits'))
+    except PatitoCompileError as e:
+        return BatchResult(path, error='Error in Compiler\n' + str(e.error), elapsed=time.perf_counter() - start)
+    except Exception as e:
+        return BatchResult(path, error='Error in Virtual Machine ' + str(e), elapsed=time.perf_counter() - start)
+    error = None
+    if result.error is not None:
+        error = 'Error in Virtual Machine ' + str(result.error)
+        if isinstance(result.error, PatitoLimitError):
+            error += ' ' + str(result.error.as_dict())
+    return BatchResult(path, result.output, result.variables, result.executed_quads, time.perf_counter() - start, error)
+
+# Get the programs of a directory (every .txt file) or of a manifest (a path per line,
+# relative to the manifest; empty lines and lines that start with # are skipped)
+def collect_programs(path):
+    if os.path.isdir(path):
+        names = sorted(name for name in os.listdir(path) if name.endswith('.txt'))
+        return [os.path.join(path, name) for name in names]
+
+    directory = os.path.dirname(path)
+    programs = []
+    for line in read_file(path).splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            programs.append(os.path.join(directory, line))
+    return programs
+
+# Run the programs in a pool of processes. The results keep the order of the programs.
+def run_batch(programs, workers = None, engine = 'loop', optimizations = (), chunksize = None, limits = None):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunksize is None:
+        # A few chunks per worker to balance the load without sending every program alone
+        chunksize = max(1, len(programs) // (workers * 4))
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(engine, tuple(optimizations), limits)) as executor:
+        return list(executor.map(run_program, programs, chunksize=chunksize))
+
+# Name of the files of a result: its position in the batch and the name of the program,
+# so programs with the same name in different directories don't share their files
+def result_name(number, path, count):
+    return '%0*d-%s' % (len(str(max(count - 1, 0))), number, os.path.splitext(os.path.basename(path))[0])
+
+# Write the output and the error of every program in its own files. Returns the names.
+def write_results(results, directory):
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for number, result in enumerate(results):
+        name = result_name(number, result.path, len(results))
+        names.append(name)
+        with open(os.path.join(directory, name + '.out'), 'w') as file:
+            file.write(result.output or '')
+        if result.error is not None:
+            with open(os.path.join(directory, name + '.err'), 'w') as file:
+                file.write(result.error + '\n')
+    return names
+
+# Check that two programs with the same name in different directories of a manifest
+# keep their own output files. Returns the failed checks.
+def check_same_names(workers = 2):
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        for folder, text in (('a', 'primero'), ('b', 'segundo')):
+            os.makedirs(os.path.join(directory, folder))
+            with open(os.path.join(directory, folder, 'test.txt'), 'w') as file:
+                file.write('program p;\n{\n    cout(\'' + text + '\');\n}\nend\n')
+        manifest = os.path.join(directory, 'manifest.txt')
+        with open(manifest, 'w') as file:
+            file.write('a/test.txt\nb/test.txt\n')
+
+        results = run_batch(collect_programs(manifest), workers)
+        output_dir = os.path.join(directory, 'results')
+        names = write_results(results, output_dir)
+        if len(set(names)) != len(results):
+            failures.append('results share their files: ' + ', '.join(names))
+        for name, result in zip(names, results):
+            with open(os.path.join(output_dir, name + '.out')) as file:
+                if result.error is not None or file.read() != result.output or not result.output:
+                    failures.append(result.path + ': ' + name + '.out does not have its output')
+    for failure in failures:
+        print('FAIL ' + failure)
+    return failures
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Compile and run many Patito programs in parallel')
+    arg_parser.add_argument('programs', nargs='?', help='directory with .txt programs or manifest with a path per line')
+    arg_parser.add_argument('--workers', type=int, help='number of processes (default: number of CPUs)')
+    arg_parser.add_argument('--engine', choices=PatitoVirtualMachine.engines, default='loop', help='engine used to execute the quads')
+    arg_parser.add_argument('--optimize', action='append', choices=PatitoOptimizer.passes, default=[], help='optimization pass to apply (can be repeated)')
+    arg_parser.add_argument('--max-quads', type=int, help='stop a program after executing this number of quads')
+    arg_parser.add_argument('--timeout', type=float, help='stop a program after this number of seconds')
+    arg_parser.add_argument('--output-dir', metavar='DIR', help='write the output and errors of every program in DIR instead of printing them')
+    arg_parser.add_argument('--check-names', action='store_true', help='check that programs with the same name keep their own output files (exit status 1 if not)')
+    args = arg_parser.parse_args()
+
+    if args.check_names:
+        sys.exit(1 if check_same_names() else 0)
+    if args.programs is None:
+        arg_parser.error('the programs are needed')
+
+    programs = collect_programs(args.programs)
+    start = time.perf_counter()
+    limits = None
+    if args.max_quads is not None or args.timeout is not None:
+        limits = PatitoLimits(args.max_quads, args.timeout)
+    results = run_batch(programs, args.workers, args.engine, args.optimize, limits=limits)
+    elapsed = time.perf_counter() - start
+
+    if args.output_dir:
+        write_results(results, args.output_dir)
+    else:
+        for result in results:
+            print('--------- ' + result.path + ' --------- ')
+            print(result.output if result.error is None else result.error)
+
+    failed = sum(1 for result in results if result.error is not None)
+    print('%d programs, %d with errors, %.3f s (%.1f programs/s)' % (len(results), failed, elapsed, len(results) / elapsed if elapsed else 0))
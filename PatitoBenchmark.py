@@ -0,0 +1,330 @@
+# ------------------------------------------------------------
+# PatitoBenchmark.py
+#
+# Benchmarks to compare the engines of the Virtual Machine
+# ------------------------------------------------------------
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+from tabulate import tabulate
+from PatitoCFG import back_edges
+from PatitoGenerator import generate_declarations_program, generate_program
+from PatitoMemory import list_nbytes
+from PatitoOutput import PatitoOutput
+from PatitoParser import COMPILER_VERSION, get_parser
+from PatitoProgram import compile
+from PatitoTimings import PatitoTimings
+from PatitoVirtualMachine import PatitoVirtualMachine, read_file
+
+# Test programs that compile and run without errors
+BUNDLED_PROGRAMS = [
+    'testFibonacciFactorial.txt',
+    'testCondition.txt',
+    'testWhile.txt',
+    'testPrint.txt',
+]
+
+# Compile a program and return a Virtual Machine ready to be executed.
+# The output of the program is discarded.
+def load_program(data, memory_model = 'list'):
+    patitoVM = PatitoVirtualMachine(memory_model=memory_model, output=PatitoOutput())
+    patitoVM.load(data)
+    return patitoVM
+
+# Time the execution of a program with an engine. Returns the best time of the repetitions.
+def time_engine(patitoVM, engine, repeat = 5, number = 200):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            patitoVM.create_memory_vars()
+            patitoVM.run_engine(engine)
+        elapsed = (time.perf_counter() - start) / number
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+# Compare every engine on every bundled program
+def compare_engines(programs = BUNDLED_PROGRAMS, engines = PatitoVirtualMachine.engines, repeat = 5, number = 200):
+    table = []
+    for program in programs:
+        patitoVM = load_program(read_file(program))
+        times = [time_engine(patitoVM, engine, repeat, number) for engine in engines]
+        row = [program, len(patitoVM.quadruples)]
+        for elapsed in times:
+            row.append('%.1f' % (elapsed * 1e6))
+        for elapsed in times[1:]:
+            row.append('%.2fx' % (times[0] / elapsed))
+        table.append(row)
+
+    headers = ['program', 'quads'] + [engine + ' (us)' for engine in engines] + ['speedup ' + engine for engine in engines[1:]]
+    print(tabulate(table, headers=headers, tablefmt='grid'))
+    return table
+
+# Compare size and execution time of every memory model on every bundled program
+def compare_memory_models(programs = BUNDLED_PROGRAMS, repeat = 5, number = 200):
+    table = []
+    for program in programs:
+        row = [program]
+        for memory_model in PatitoVirtualMachine.memory_models:
+            patitoVM = load_program(read_file(program), memory_model)
+            elapsed = time_engine(patitoVM, 'loop', repeat, number)
+            memory = patitoVM.memory
+            size = memory.nbytes() if memory_model == 'typed' else list_nbytes(memory)
+            row += [size, '%.1f' % (elapsed * 1e6)]
+        table.append(row)
+
+    headers = ['program']
+    for memory_model in PatitoVirtualMachine.memory_models:
+        headers += [memory_model + ' (bytes)', memory_model + ' (us)']
+    print(tabulate(table, headers=headers, tablefmt='grid'))
+    return table
+
+# Time the compiler with programs of growing size. The time per declaration should stay flat.
+def compile_scaling(sizes = (1000, 10000, 100000)):
+    parser = get_parser()
+    table = []
+    for size in sizes:
+        data = generate_declarations_program(size)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = parser.parse(data)
+        elapsed = time.perf_counter() - start
+        if result is None or result[-1] != '':
+            raise RuntimeError('Generated program with ' + str(size) + ' declarations does not compile')
+        table.append([size, '%.3f' % elapsed, '%.2f' % (elapsed / size * 1e6)])
+
+    print(tabulate(table, headers=['declarations', 'compile (s)', 'per declaration (us)'], tablefmt='grid'))
+    return table
+
+# Time the licm pass with generated programs of growing size. Every program has a loop
+# with the given number of assignments. The time per quad should stay flat, so a size
+# that takes more than max_ratio times the time per quad of the first one fails.
+def licm_scaling(sizes = (500, 2000, 8000), max_ratio = 3.0):
+    table = []
+    failures = []
+    first = None
+    for size in sizes:
+        data = generate_program(trip=10, depth=3, variables=size)
+        timings = PatitoTimings(memory=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            plain = compile(data)
+            hoisted = compile(data, ('licm',), timings=timings)
+        elapsed = timings.phases['optimize']['time']
+        per_quad = elapsed / len(plain)
+        if first is None:
+            first = per_quad
+        if hoisted.run().variables != plain.run().variables:
+            failures.append('%d assignments: the variables changed with licm' % size)
+        if per_quad > first * max_ratio:
+            failures.append('%d assignments: %.2f us per quad, %.2f us with %d' % (size, per_quad * 1e6, first * 1e6, sizes[0]))
+        table.append([size, len(plain), '%.3f' % elapsed, '%.2f' % (per_quad * 1e6), '%.2fx' % (per_quad / first)])
+
+    print('LICM')
+    print(tabulate(table, headers=['assignments', 'quads', 'licm (s)', 'per quad (us)', 'ratio'], tablefmt='grid'))
+    print('\n')
+    for failure in failures:
+        print('FAIL ' + failure)
+    return failures
+
+# Parameters of the generated programs. Every sweep changes one parameter of the base.
+BASE_PARAMETERS = {'trip': 100, 'depth': 2, 'variables': 10, 'constants': 10, 'print_every': 0}
+SWEEPS = {
+    'trip': (10, 100, 1000, 10000),
+    'depth': (1, 2, 4, 6),
+    'variables': (1, 10, 100),
+    'constants': (1, 10, 100),
+    'print_every': (0, 4, 1),
+}
+
+# Read every token of a program with the lexer of the parser
+def tokenize(lexer, data):
+    lexer.input(data)
+    lexer.lineno = 1
+    while lexer.token() is not None:
+        pass
+
+# Parse a program measuring the time spent generating quads. Quads are generated by the
+# rules while the parser reads the tokens, so generate_quad is timed on every call.
+# Returns the total time and the time of the quads.
+def time_parse(parser, data):
+    original = parser.generate_quad
+    quads = [0.0]
+
+    def timed_generate_quad(*args):
+        start = time.perf_counter()
+        try:
+            return original(*args)
+        finally:
+            quads[0] += time.perf_counter() - start
+
+    parser.generate_quad = timed_generate_quad
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = parser.parse(data)
+        elapsed = time.perf_counter() - start
+    finally:
+        del parser.generate_quad
+    if result is None or result[-1] != '':
+        raise RuntimeError('Generated program does not compile')
+    return elapsed, quads[0]
+
+# Measure the phases of a program: lex, parse (without lex and quads), quads, link and
+# the execution with every engine. Every phase keeps the best time of the repetitions.
+def measure_program(data, engines = PatitoVirtualMachine.engines, repeat = 5):
+    parser = get_parser()
+    if parser.parser is None:
+        parser.build()
+
+    lex = min(time_call(lambda: tokenize(parser.lexer, data)) for _ in range(repeat))
+    parse, quads = min(time_parse(parser, data) for _ in range(repeat))
+
+    timings = PatitoTimings(memory=False)
+    program = compile(data, timings=timings)
+    link = timings.phases['link']['time']
+
+    execute = {}
+    executed_quads = 0
+    for engine in engines:
+        results = [program.run(engine) for _ in range(repeat)]
+        execute[engine] = min(result.elapsed for result in results)
+        executed_quads = results[0].executed_quads
+
+    return {
+        'quads': len(program),
+        'executed_quads': executed_quads,
+        'lex': lex,
+        'parse': max(0.0, parse - lex - quads),
+        'quads_time': quads,
+        'link': link,
+        'execute': execute,
+    }
+
+# Time of one call of a function
+def time_call(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+# Measure generated programs of every sweep
+def run_suite(sweeps = SWEEPS, engines = PatitoVirtualMachine.engines, repeat = 5):
+    results = []
+    for name, values in sweeps.items():
+        for value in values:
+            parameters = dict(BASE_PARAMETERS)
+            parameters[name] = value
+            measures = measure_program(generate_program(**parameters), engines, repeat)
+            results.append({'sweep': name, 'parameters': parameters, 'measures': measures})
+    return {
+        'compiler_version': COMPILER_VERSION,
+        'python': platform.python_version(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+# Print a table for every sweep with the time of every phase
+def print_suite(suite, engines = PatitoVirtualMachine.engines):
+    sweeps = {}
+    for result in suite['results']:
+        sweeps.setdefault(result['sweep'], []).append(result)
+
+    for name, results in sweeps.items():
+        table = []
+        for result in results:
+            measures = result['measures']
+            row = [result['parameters'][name], measures['quads'], measures['executed_quads']]
+            row += ['%.1f' % (measures[phase] * 1e6) for phase in ('lex', 'parse', 'quads_time', 'link')]
+            row += ['%.1f' % (measures['execute'][engine] * 1e6) for engine in engines]
+            table.append(row)
+        headers = [name, 'quads', 'executed', 'lex (us)', 'parse (us)', 'quads (us)', 'link (us)'] + [engine + ' (us)' for engine in engines]
+        print('SWEEP ' + name.upper())
+        print(tabulate(table, headers=headers, tablefmt='grid'))
+        print('\n')
+
+# Compare two runs of the suite. Phases that got slower than threshold are marked.
+def compare_suites(old, new, threshold = 1.1):
+    old_results = {(result['sweep'], json.dumps(result['parameters'], sort_keys=True)): result['measures'] for result in old['results']}
+    table = []
+    for result in new['results']:
+        key = (result['sweep'], json.dumps(result['parameters'], sort_keys=True))
+        if key not in old_results:
+            continue
+        old_measures = old_results[key]
+        measures = result['measures']
+        phases = [('parse', old_measures['lex'] + old_measures['parse'] + old_measures['quads_time'], measures['lex'] + measures['parse'] + measures['quads_time'])]
+        phases += [(engine, old_measures['execute'][engine], measures['execute'][engine]) for engine in measures['execute'] if engine in old_measures['execute']]
+        for phase, before, after in phases:
+            ratio = after / before if before else float('inf')
+            table.append([result['sweep'], result['parameters'][result['sweep']], phase, '%.1f' % (before * 1e6), '%.1f' % (after * 1e6), '%.2fx' % ratio, 'REGRESSION' if ratio > threshold else ''])
+
+    print(tabulate(table, headers=['sweep', 'value', 'phase', 'before (us)', 'after (us)', 'ratio', ''], tablefmt='grid'))
+    return table
+
+# Check that the fuse pass keeps the output of every bundled program with every engine
+# and executes fewer quads in the programs with loops. Returns the failed checks.
+def check_fuse(programs = BUNDLED_PROGRAMS, engines = PatitoVirtualMachine.engines):
+    table = []
+    failures = []
+    for file_name in programs:
+        data = read_file(file_name)
+        with contextlib.redirect_stdout(io.StringIO()):
+            plain = compile(data)
+            fused = compile(data, ('fuse',))
+        loops = bool(back_edges(plain.code))
+        for engine in engines:
+            before = plain.run(engine)
+            after = fused.run(engine)
+            same_output = after.output == before.output and after.variables == before.variables
+            fewer = after.executed_quads < before.executed_quads if loops else after.executed_quads <= before.executed_quads
+            if not same_output:
+                failures.append(file_name + ' (' + engine + '): the output changed')
+            if not fewer:
+                failures.append(file_name + ' (' + engine + '): %d quads executed with fuse, %d without' % (after.executed_quads, before.executed_quads))
+            table.append([file_name, engine, 'yes' if loops else 'no', before.executed_quads, after.executed_quads, 'OK' if same_output and fewer else 'FAIL'])
+
+    print('FUSE')
+    print(tabulate(table, headers=['program', 'engine', 'loops', 'quads', 'quads with fuse', 'check'], tablefmt='grid'))
+    print('\n')
+    for failure in failures:
+        print('FAIL ' + failure)
+    return failures
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Benchmark the engines of the Patito Virtual Machine')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='number of repetitions, the best one is reported')
+    arg_parser.add_argument('--number', type=int, default=200, help='number of runs per repetition')
+    arg_parser.add_argument('--scaling', action='store_true', help='time the compiler with generated programs up to 100k declarations')
+    arg_parser.add_argument('--licm-scaling', action='store_true', help='check that the licm pass takes a flat time per quad up to 64k quads (exit status 1 if not)')
+    arg_parser.add_argument('--suite', action='store_true', help='time every phase with generated programs of every sweep')
+    arg_parser.add_argument('--save', metavar='FILE', help='save the results of the suite as JSON')
+    arg_parser.add_argument('--compare', metavar='FILE', help='compare the suite with the results saved in FILE')
+    arg_parser.add_argument('--check-fuse', action='store_true', help='check that the fuse pass keeps the output and executes fewer quads (exit status 1 if not)')
+    args = arg_parser.parse_args()
+
+    if args.check_fuse:
+        if check_fuse():
+            sys.exit(1)
+    elif args.licm_scaling:
+        if licm_scaling():
+            sys.exit(1)
+    elif args.scaling:
+        compile_scaling()
+    elif args.suite:
+        suite = run_suite(repeat=args.repeat)
+        print_suite(suite)
+        if args.save:
+            with open(args.save, 'w') as file:
+                json.dump(suite, file, indent=2)
+        if args.compare:
+            with open(args.compare) as file:
+                compare_suites(json.load(file), suite)
+    else:
+        compare_engines(repeat=args.repeat, number=args.number)
+        compare_memory_models(repeat=args.repeat, number=args.number)
@@ -0,0 +1,212 @@
+# ------------------------------------------------------------
+# PatitoBytecode.py
+#
+# Binary object file of a linked program in Patito Language
+#
+# Layout (little endian):
+#   header     magic, version, number of quads, number of symbols,
+#              offsets of every section and size of every segment
+#   code       4 int32 per quad: opcode, operand1, operand2, result.
+#              Operands are indexes of the memory array (-1 is None)
+#              and jumps keep the number of the quad as result
+#   constants  const_int as int64, const_float as float64 and
+#              const_strings as length (uint32) + utf-8 bytes
+#   symbols    length (uint32) + utf-8 name, memory index (int32)
+# ------------------------------------------------------------
+
+import argparse
+import mmap
+import struct
+import sys
+from array import array
+from PatitoParser import SEGMENTS
+
+MAGIC = b'PTBC'
+VERSION = 2
+
+# Number of every operation
+OPCODES = {
+    '=': 0,
+    '+': 1,
+    '-': 2,
+    '*': 3,
+    '/': 4,
+    '>': 5,
+    '<': 6,
+    '!=': 7,
+    'cout': 8,
+    'GoTo': 9,
+    'GoToV': 10,
+    'GoToF': 11,
+    'GoToV>': 12,
+    'GoToV<': 13,
+    'GoToV!=': 14,
+    'GoToF>': 15,
+    'GoToF<': 16,
+    'GoToF!=': 17,
+}
+OPERATIONS = {number: operation for operation, number in OPCODES.items()}
+
+HEADER = struct.Struct('<4sHHII' + 'I' * 3 + 'I' * len(SEGMENTS))
+LENGTH = struct.Struct('<I')
+INDEX = struct.Struct('<i')
+
+class PatitoBytecode(object):
+
+    def __init__(self, code, memory_const, count_memory, symbols, buffer = None):
+        # Flat sequence of int32 with 4 values per quad
+        self.code = code
+        self.memory_const = memory_const
+        self.count_memory = count_memory
+        # Memory index of every variable
+        self.symbols = symbols
+        # Mapped file, kept open while the code is used
+        self.buffer = buffer
+
+    # Number of quads in the program
+    def __len__(self):
+        return len(self.code) // 4
+
+    # Create memory (an array with the constants and a space for every variable and temporal)
+    def create_memory(self):
+        size = sum(self.count_memory[segment] for segment in SEGMENTS[3:])
+        return list(self.memory_const) + [None] * size
+
+    # Release the mapped file
+    def close(self):
+        if self.buffer is not None:
+            if isinstance(self.code, memoryview):
+                self.code.release()
+            self.buffer.close()
+            self.buffer = None
+
+# Encode linked quads as a flat array of int32
+def encode(linked_code):
+    code = array('i')
+    for operation, operand1, operand2, result in linked_code:
+        code.append(OPCODES[operation])
+        code.append(-1 if operand1 is None else operand1)
+        code.append(-1 if operand2 is None else operand2)
+        code.append(-1 if result is None else result)
+    return code
+
+# Create the bytecode of a linked Virtual Machine
+def from_virtual_machine(patitoVM):
+    code = encode(patitoVM.code)
+
+    symbols = {}
+    for name, variable in patitoVM.symbol_table.items():
+        symbols[name] = patitoVM.find_dir_in_memory(variable['memory_dir'])
+
+    return PatitoBytecode(code, list(patitoVM.memory_const), dict(patitoVM.count_memory), symbols)
+
+# Convert a bytecode to bytes
+def dumps(bytecode):
+    count_memory = bytecode.count_memory
+    code = array('i', bytecode.code)
+    if sys.byteorder != 'little':
+        code.byteswap()
+    code_bytes = code.tobytes()
+
+    # Constant pool, every type in its own section
+    const_int = count_memory['const_int']
+    const_float = count_memory['const_float']
+    constants = bytearray()
+    try:
+        constants += struct.pack('<%dq' % const_int, *bytecode.memory_const[:const_int])
+    except struct.error:
+        raise ValueError('Integer constant does not fit in 64 bits')
+    constants += struct.pack('<%dd' % const_float, *bytecode.memory_const[const_int:const_int + const_float])
+    for string in bytecode.memory_const[const_int + const_float:]:
+        encoded = string.encode('utf-8')
+        constants += LENGTH.pack(len(encoded)) + encoded
+
+    symbols = bytearray()
+    for name, index in bytecode.symbols.items():
+        encoded = name.encode('utf-8')
+        symbols += LENGTH.pack(len(encoded)) + encoded + INDEX.pack(index)
+
+    code_offset = HEADER.size
+    constants_offset = code_offset + len(code_bytes)
+    symbols_offset = constants_offset + len(constants)
+    header = HEADER.pack(MAGIC, VERSION, 0, len(bytecode), len(bytecode.symbols),
+                         code_offset, constants_offset, symbols_offset,
+                         *[count_memory[segment] for segment in SEGMENTS])
+    return header + code_bytes + bytes(constants) + bytes(symbols)
+
+# Read a bytecode from a buffer. The code is not copied, it's a view of the buffer.
+def loads(buffer, mapped = None):
+    view = memoryview(buffer)
+    values = HEADER.unpack_from(view, 0)
+    magic, version, _, quads, count_symbols, code_offset, constants_offset, symbols_offset = values[:8]
+    if magic != MAGIC:
+        raise ValueError('File is not Patito bytecode')
+    if version != VERSION:
+        raise ValueError('Bytecode version ' + str(version) + ' is not supported')
+    count_memory = dict(zip(SEGMENTS, values[8:]))
+
+    code = view[code_offset:code_offset + quads * 16]
+    if sys.byteorder == 'little':
+        code = code.cast('i')
+    else:
+        code = array('i', code.tobytes())
+        code.byteswap()
+
+    # Constant pool
+    const_int = count_memory['const_int']
+    const_float = count_memory['const_float']
+    offset = constants_offset
+    memory_const = list(struct.unpack_from('<%dq' % const_int, view, offset))
+    offset += 8 * const_int
+    memory_const += struct.unpack_from('<%dd' % const_float, view, offset)
+    offset += 8 * const_float
+    for _ in range(count_memory['const_strings']):
+        (length,) = LENGTH.unpack_from(view, offset)
+        offset += LENGTH.size
+        memory_const.append(bytes(view[offset:offset + length]).decode('utf-8'))
+        offset += length
+
+    symbols = {}
+    offset = symbols_offset
+    for _ in range(count_symbols):
+        (length,) = LENGTH.unpack_from(view, offset)
+        offset += LENGTH.size
+        name = bytes(view[offset:offset + length]).decode('utf-8')
+        offset += length
+        (symbols[name],) = INDEX.unpack_from(view, offset)
+        offset += INDEX.size
+
+    return PatitoBytecode(code, memory_const, count_memory, symbols, mapped)
+
+# Write a bytecode in a file
+def write(path, bytecode):
+    with open(path, 'wb') as file:
+        file.write(dumps(bytecode))
+
+# Load a bytecode file mapping it in memory
+def load(path):
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return loads(mapped, mapped)
+
+
+if __name__ == '__main__':
+    from PatitoOptimizer import PatitoOptimizer
+    from PatitoVirtualMachine import PatitoVirtualMachine, read_file
+
+    arg_parser = argparse.ArgumentParser(description='Compile Patito programs to bytecode and run them')
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+    compile_parser = subparsers.add_parser('compile', help='compile a program to a bytecode file')
+    compile_parser.add_argument('program')
+    compile_parser.add_argument('-o', '--output', required=True)
+    compile_parser.add_argument('--optimize', action='append', choices=PatitoOptimizer.passes, default=[], help='optimization pass to apply (can be repeated)')
+    run_parser = subparsers.add_parser('run', help='run a bytecode file')
+    run_parser.add_argument('bytecode')
+    args = arg_parser.parse_args()
+
+    patitoVM = PatitoVirtualMachine(optimizations=getattr(args, 'optimize', ()))
+    if args.command == 'compile':
+        if patitoVM.load(read_file(args.program)):
+            write(args.output, from_virtual_machine(patitoVM))
+    else:
+        patitoVM.run_bytecode(load(args.bytecode))
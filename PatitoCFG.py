@@ -0,0 +1,243 @@
+# ------------------------------------------------------------
+# PatitoCFG.py
+#
+# Basic blocks and control flow graph of the quads of a program in
+# Patito Language. It works with the quads of the compiler and with the
+# linked quads, because jumps keep the number of the quad in both.
+#
+# A basic block starts at the first quad, at the target of a jump and
+# after a jump. Edges go from the last quad of a block to the blocks
+# that can run after it; None is the end of the program.
+# ------------------------------------------------------------
+
+import argparse
+import contextlib
+import io
+from tabulate import tabulate
+from PatitoParser import JUMPS
+
+# Quads that can run after the quad in program_counter
+def successors(quads, program_counter):
+    operation, operand1, operand2, result = quads[program_counter]
+    following = []
+    if operation in JUMPS:
+        following.append(result)
+    if operation != 'GoTo' and program_counter + 1 < len(quads):
+        following.append(program_counter + 1)
+    return following
+
+# Quads that start a basic block
+def leaders(quads):
+    starts = {0}
+    for program_counter, (operation, operand1, operand2, result) in enumerate(quads):
+        if operation in JUMPS:
+            starts.add(result)
+            starts.add(program_counter + 1)
+    return {start for start in starts if start < len(quads)}
+
+# Jumps back to a previous quad as (first quad of the loop, quad of the jump)
+def back_edges(quads):
+    found = set()
+    for program_counter, (operation, operand1, operand2, result) in enumerate(quads):
+        if operation in JUMPS and result <= program_counter:
+            found.add((result, program_counter))
+    return found
+
+class BasicBlock(object):
+
+    def __init__(self, number, start, end):
+        self.number = number
+        # Quads of the block, from start to end (not included)
+        self.start = start
+        self.end = end
+        # Numbers of the blocks that can run after and before it (None is the end of the program)
+        self.successors = []
+        self.predecessors = []
+        # Number of loops the block is in
+        self.depth = 0
+
+    # Number of quads of the block
+    def __len__(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return 'BasicBlock(%d, %d, %d)' % (self.number, self.start, self.end)
+
+class PatitoCFG(object):
+
+    def __init__(self, quads):
+        self.quads = quads
+        starts = sorted(leaders(quads))
+        self.blocks = []
+        # Number of the block of every quad
+        self.block_of = [None] * len(quads)
+        for number, start in enumerate(starts):
+            end = starts[number + 1] if number + 1 < len(starts) else len(quads)
+            self.blocks.append(BasicBlock(number, start, end))
+            self.block_of[start:end] = [number] * (end - start)
+
+        # Edges as (block, next block, kind). The kind is 'jump' for GoTo, 'taken' and
+        # 'not taken' for the jumps with a condition, and 'next' for the following quad.
+        self.edges = []
+        for block in self.blocks:
+            operation, operand1, operand2, target = quads[block.end - 1]
+            if operation in JUMPS:
+                self.add_edge(block, target, 'jump' if operation == 'GoTo' else 'taken')
+            if operation != 'GoTo':
+                self.add_edge(block, block.end, 'next' if operation not in JUMPS else 'not taken')
+
+        self.loops = self.find_loops()
+        for loop in self.loops:
+            for number in loop['blocks']:
+                self.blocks[number].depth += 1
+
+    def add_edge(self, block, quad, kind):
+        following = self.block_of[quad] if quad < len(self.quads) else None
+        block.successors.append(following)
+        if following is not None:
+            self.blocks[following].predecessors.append(block.number)
+        self.edges.append((block.number, following, kind))
+
+    # Block that starts in a quad (None if no block starts there)
+    def block_at(self, program_counter):
+        if program_counter < len(self.quads) and self.blocks[self.block_of[program_counter]].start == program_counter:
+            return self.block_of[program_counter]
+        return None
+
+    # Loops of the program, one for every edge back to a block. The blocks of a loop are
+    # the ones that reach the edge back without going through the first block of the loop.
+    def find_loops(self):
+        loops = []
+        for source, header, kind in self.edges:
+            if header is None or header > source:
+                continue
+            body = {header, source}
+            pending = [source]
+            while pending:
+                number = pending.pop()
+                if number == header:
+                    continue
+                for predecessor in self.blocks[number].predecessors:
+                    if predecessor not in body:
+                        body.add(predecessor)
+                        pending.append(predecessor)
+            loops.append({
+                'header': header,
+                'latch': source,
+                'start': self.blocks[header].start,
+                'end': self.blocks[source].end - 1,
+                'blocks': sorted(body),
+                'quads': sum(len(self.blocks[number]) for number in body),
+                # Blocks that can leave the loop
+                'exits': sorted({number for number in body for following in self.blocks[number].successors if following not in body}),
+            })
+        return sorted(loops, key=lambda loop: (loop['start'], -loop['end']))
+
+    # Blocks that end with a jump with a condition, with the block of every direction
+    def branches(self):
+        rows = []
+        for block in self.blocks:
+            operation, operand1, operand2, target = self.quads[block.end - 1]
+            if operation not in JUMPS or operation == 'GoTo':
+                continue
+            rows.append({
+                'block': block.number,
+                'quad': block.end - 1,
+                'operation': operation,
+                'taken': block.successors[0],
+                'not_taken': block.successors[1],
+                # Jumps back are the condition of a loop, the rest choose a branch of an if
+                'kind': 'loop' if target <= block.end - 1 else 'if',
+            })
+        return rows
+
+    # Summary of the graph
+    def stats(self):
+        sizes = [len(block) for block in self.blocks]
+        return {
+            'quads': len(self.quads),
+            'blocks': len(self.blocks),
+            'edges': len(self.edges),
+            'loops': len(self.loops),
+            'branches': len(self.branches()),
+            'max_depth': max((block.depth for block in self.blocks), default=0),
+            'mean_block': sum(sizes) / len(sizes) if sizes else 0.0,
+        }
+
+    # Graph in Graphviz dot. Every block shows its quads, and its executions if counts
+    # (the executions of every quad, like the ones of the profile engine) are given.
+    def to_dot(self, counts = None, name = 'patito'):
+        lines = ['digraph ' + name + ' {', '    node [shape=box, fontname="monospace"];']
+        for block in self.blocks:
+            label = 'B%d' % block.number
+            if counts is not None:
+                label += ' (%d)' % counts[block.start]
+            quads = ['%d: %s' % (program_counter, ' '.join(str(part) for part in self.quads[program_counter] if part is not None)) for program_counter in range(block.start, block.end)]
+            text = '\\l'.join([label] + quads) + '\\l'
+            lines.append('    B%d [label="%s"];' % (block.number, text.replace('"', '\\"')))
+        if any(following is None for source, following, kind in self.edges) or not self.blocks:
+            lines.append('    end [shape=doublecircle, label="end"];')
+        for source, following, kind in self.edges:
+            target = 'end' if following is None else 'B%d' % following
+            attributes = []
+            if kind != 'next':
+                attributes.append('label="%s"' % kind)
+            if following is not None and following <= source:
+                # Edges back to a loop
+                attributes.append('color=red')
+            lines.append('    B%d -> %s%s;' % (source, target, ' [' + ', '.join(attributes) + ']' if attributes else ''))
+        lines.append('}')
+        return '\n'.join(lines) + '\n'
+
+    # Save the graph in a dot file
+    def dump_dot(self, path, counts = None):
+        with open(path, 'w') as file:
+            file.write(self.to_dot(counts))
+
+    # Print the tables of the blocks, loops and branches
+    def print_report(self):
+        stats = self.stats()
+        print('CFG: %d quads, %d blocks (%.1f quads per block), %d edges' % (stats['quads'], stats['blocks'], stats['mean_block'], stats['edges']))
+        print('\n')
+        print('BLOCKS')
+        print(tabulate([[block.number, block.start, block.end - 1, len(block), block.depth, ' '.join('end' if following is None else str(following) for following in block.successors)] for block in self.blocks],
+                       headers=['block', 'first quad', 'last quad', 'quads', 'depth', 'successors'], tablefmt='grid'))
+        print('\n')
+        print('LOOPS')
+        print(tabulate([[loop['start'], loop['end'], loop['header'], loop['latch'], len(loop['blocks']), loop['quads'], ' '.join(str(number) for number in loop['exits'])] for loop in self.loops],
+                       headers=['start', 'end', 'header', 'latch', 'blocks', 'quads', 'exits'], tablefmt='grid'))
+        print('\n')
+        print('BRANCHES')
+        print(tabulate([[branch['block'], branch['quad'], branch['operation'], branch['kind'], branch['taken'], 'end' if branch['not_taken'] is None else branch['not_taken']] for branch in self.branches()],
+                       headers=['block', 'quad', 'operation', 'kind', 'taken', 'not taken'], tablefmt='grid'))
+        print('\n')
+
+
+if __name__ == '__main__':
+    # Imported here because the Virtual Machine uses this module
+    from PatitoOptimizer import PatitoOptimizer
+    from PatitoOutput import PatitoOutput
+    from PatitoVirtualMachine import PatitoVirtualMachine, read_file
+
+    arg_parser = argparse.ArgumentParser(description='Print the basic blocks and control flow graph of a Patito program')
+    arg_parser.add_argument('program')
+    arg_parser.add_argument('--optimize', action='append', choices=PatitoOptimizer.passes, default=[], help='optimization pass to apply (can be repeated)')
+    arg_parser.add_argument('--dot', metavar='FILE', help='save the graph in Graphviz dot')
+    arg_parser.add_argument('--counts', action='store_true', help='run the program and show the executions of every block in the graph')
+    args = arg_parser.parse_args()
+
+    patitoVM = PatitoVirtualMachine(optimizations=args.optimize, output=PatitoOutput())
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaded = patitoVM.load(read_file(args.program))
+    if not loaded:
+        print('Error in Compiler\n', patitoVM.error)
+    else:
+        cfg = PatitoCFG(patitoVM.code)
+        cfg.print_report()
+        if args.dot:
+            counts = None
+            if args.counts:
+                patitoVM.create_memory_vars()
+                patitoVM.run_engine('profile')
+                counts = patitoVM.quad_counts
+            cfg.dump_dot(args.dot, counts)
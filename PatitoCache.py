@@ -0,0 +1,102 @@
+# ------------------------------------------------------------
+# PatitoCache.py
+#
+# Cache in disk of compiled programs in Patito Language
+# ------------------------------------------------------------
+
+import hashlib
+import os
+import pickle
+import tempfile
+from PatitoParser import COMPILER_VERSION
+
+class PatitoCache(object):
+
+    def __init__(self, directory = '.patito_cache', max_bytes = 64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    # Key of a program: hash of the compiler version and the source
+    def key(self, source):
+        content = COMPILER_VERSION + '\0' + source
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    # Path of the file of a key
+    def path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    # Get the compiled program of a source. Returns None if it's not in the cache.
+    def get(self, source):
+        path = self.path(self.key(source))
+        try:
+            with open(path, 'rb') as file:
+                compiled = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+
+        # Update access time to keep the least recently used order
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return compiled
+
+    # Store the compiled program of a source
+    def put(self, source, compiled):
+        path = self.path(self.key(source))
+        # Write in a temporal file and rename it so readers never see half a file
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                pickle.dump(compiled, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.evict()
+
+    # Remove the least recently used programs until the cache fits in max_bytes
+    def evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pkl'):
+                continue
+            try:
+                info = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((info.st_mtime, info.st_size, name))
+            total += info.st_size
+
+        entries.sort()
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+    # Remove every program in the cache
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                os.remove(os.path.join(self.directory, name))
+
+    # Counters of the cache
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,73 @@
+# ------------------------------------------------------------
+# PatitoGenerator.py
+#
+# Generators of synthetic programs in Patito Language for benchmarks
+# ------------------------------------------------------------
+
+import argparse
+import random
+
+# Operators used in generated expressions. Division is left out so a
+# program never divides by zero.
+OPERATORS = ('+', '-', '*')
+
+# Generate a program with a do-while of trip iterations. Every iteration assigns
+# each of the variables an expression of the given depth made of the loop counter
+# and constants (taken from a pool of different constants). Values don't grow with
+# the iterations because expressions only read the counter and constants.
+# A cout is added after every print_every assignments (0 for no prints).
+def generate_program(trip = 100, depth = 2, variables = 10, constants = 10, print_every = 0, seed = 0):
+    generator = random.Random(seed)
+    pool = [str(number + 2) for number in range(max(1, constants))]
+    used = [0]
+
+    # Next constant of the pool, so every constant of the pool is used
+    def constant():
+        value = pool[used[0] % len(pool)]
+        used[0] += 1
+        return value
+
+    def expression(level):
+        if level == 0:
+            return 'i' if generator.random() < 0.5 else constant()
+        operator = generator.choice(OPERATORS)
+        return '(' + expression(level - 1) + ' ' + operator + ' ' + expression(level - 1) + ')'
+
+    names = ['v' + str(number) for number in range(variables)]
+    lines = ['program sintetico;', 'var']
+    lines += ['    ' + ', '.join(['i'] + names[:9]) + ': int;']
+    lines += ['    ' + ', '.join(names[start:start + 10]) + ': int;' for start in range(9, variables, 10)]
+    lines += ['{', '    i = 0;', '    do {']
+    for number, name in enumerate(names):
+        lines.append('        ' + name + ' = ' + expression(depth) + ';')
+        if print_every and (number + 1) % print_every == 0:
+            lines.append('        cout(' + name + ');')
+    # Constants that were not used by the expressions are used once here
+    while used[0] < len(pool):
+        lines.append('        i = i + ' + constant() + ' - ' + pool[used[0] - 1] + ';')
+    lines += ['        i = i + 1;', '    } while (i < ' + str(trip) + ');', '}', 'end']
+    return '\n'.join(lines)
+
+# Generate a program with size int variables, declared in groups of 10, and size
+# different constants (one assignment per variable)
+def generate_declarations_program(size):
+    names = ['v' + str(number) for number in range(size)]
+    lines = ['program escala;', 'var']
+    lines += ['    ' + ', '.join(names[start:start + 10]) + ': int;' for start in range(0, size, 10)]
+    lines += ['{']
+    lines += ['    ' + name + ' = ' + str(number) + ';' for number, name in enumerate(names)]
+    lines += ['}', 'end']
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Generate a synthetic Patito program')
+    arg_parser.add_argument('--trip', type=int, default=100, help='iterations of the loop')
+    arg_parser.add_argument('--depth', type=int, default=2, help='depth of every expression')
+    arg_parser.add_argument('--variables', type=int, default=10, help='number of variables assigned in the loop')
+    arg_parser.add_argument('--constants', type=int, default=10, help='number of different constants')
+    arg_parser.add_argument('--print-every', type=int, default=0, help='add a cout after this number of assignments')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+
+    print(generate_program(args.trip, args.depth, args.variables, args.constants, args.print_every, args.seed))
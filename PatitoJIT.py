@@ -0,0 +1,226 @@
+# ------------------------------------------------------------
+# PatitoJIT.py
+#
+# Tracing JIT for the Virtual Machine. Quads are interpreted with the
+# threaded handlers and every jump back to a quad (the GoToV of a
+# do-while) is counted. When a loop gets hot, the quads of its next
+# iteration are recorded and compiled to a Python closure that runs the
+# iterations of the loop with a guard on the direction of every branch.
+# When a guard fails, or the loop ends, the closure returns the quad
+# where the interpreter continues.
+# ------------------------------------------------------------
+
+import argparse
+import contextlib
+import io
+from tabulate import tabulate
+from PatitoParser import JUMPS
+from PatitoTranspiler import PatitoTranspiler
+
+# Jumps back to a loop before its iterations are compiled
+HOT_LOOP = 50
+
+# Quads recorded at most for a trace, longer loops stay interpreted
+MAX_TRACE = 1000
+
+class Trace(object):
+
+    def __init__(self, header, back_edge, path, source, function):
+        # First quad of the loop and the jump back to it
+        self.header = header
+        self.back_edge = back_edge
+        # Quads of the iteration that was recorded and if their jumps were taken
+        self.path = path
+        # Python source of the trace and the closure bound to the memory of the run
+        self.source = source
+        self.function = function
+        # Times the trace was run, and times it returned in every quad
+        self.entries = 0
+        self.exits = {}
+
+    # Jumps with a guard in the trace
+    def guards(self):
+        return sum(1 for program_counter, taken in self.path if taken is not None)
+
+    # Times a guard failed (the trace returned before the end of the loop)
+    def side_exits(self):
+        return sum(count for program_counter, count in self.exits.items() if program_counter != self.back_edge + 1)
+
+class TraceCompiler(PatitoTranspiler):
+
+    # Generate the source of a closure that runs the iterations of a trace. The closure
+    # gets the quads executed before it, returns the quad where the interpreter continues
+    # and leaves the quads executed in total[0] (also when it stops with an error).
+    def compile(self, path):
+        self.reset()
+        depth = 4
+        run = []
+        back_edge = path[-1][0]
+        for program_counter, taken in path:
+            operation, operand1, operand2, target = self.code[program_counter]
+            if operation not in JUMPS:
+                run.append(program_counter)
+                continue
+            # Quads are counted before the jump, so every exit has the exact number
+            self.emit(depth, 'q += %d' % (len(run) + 1))
+            for quad in run:
+                self.emit_quad(quad, depth)
+            run = []
+            if taken is None:
+                continue
+            if program_counter == back_edge:
+                self.emit(depth, 'if ' + self.condition(program_counter, False) + ':')
+                self.emit(depth + 1, 'return %d' % (program_counter + 1))
+            else:
+                # Guard: leave the trace if the jump goes the other way
+                self.emit(depth, 'if ' + self.condition(program_counter, not taken) + ':')
+                self.emit(depth + 1, 'return %d' % (program_counter + 1 if taken else target))
+        # Limits are checked only when a loop jumps back
+        self.emit(depth, 'if check is not None:')
+        self.emit(depth + 1, 'check(%d, executed + q)' % back_edge)
+
+        names = sorted(self.locals)
+        lines = ['def patito_trace(memory, write, check, total):', '    def trace(executed):', '        q = 0']
+        lines += ['        m%d = memory[%d]' % (index, index) for index in names]
+        lines += ['        try:', '            while True:']
+        lines += self.lines
+        lines += ['        finally:']
+        lines += ['            memory[%d] = m%d' % (index, index) for index in names]
+        lines += ['            total[0] = executed + q']
+        lines += ['    return trace', '']
+        return '\n'.join(lines)
+
+class PatitoJIT(object):
+
+    def __init__(self, patitoVM, threshold = None, max_trace = MAX_TRACE):
+        self.patitoVM = patitoVM
+        # Jumps back to a loop before it's compiled
+        self.threshold = HOT_LOOP if threshold is None else threshold
+        self.max_trace = max_trace
+        self.compiler = TraceCompiler(patitoVM.code, patitoVM.memory_const, patitoVM.count_memory)
+        # Times every loop jumped back to its first quad while it was interpreted
+        self.counts = {}
+        # Compiled trace of every loop by its first quad
+        self.traces = {}
+        # Loops that could not be recorded (inner loops or too long), they stay interpreted
+        self.rejected = set()
+        # Quads executed when a trace returns
+        self.total = [0]
+
+    # Compile the recorded iteration of a loop
+    def compile_trace(self, header, recorded):
+        code = self.patitoVM.code
+        path = []
+        for program_counter, next_quad in recorded:
+            operation, operand1, operand2, target = code[program_counter]
+            taken = None
+            # GoTo and jumps to the next quad don't need a guard
+            if operation in JUMPS and operation != 'GoTo' and target != program_counter + 1:
+                taken = next_quad != program_counter + 1
+            path.append((program_counter, taken))
+        source = self.compiler.compile(path)
+        namespace = {}
+        exec(compile(source, '<patito trace %d>' % header, 'exec'), namespace)
+        check = self.patitoVM.check_limits if self.patitoVM.limits is not None else None
+        function = namespace['patito_trace'](self.patitoVM.memory, self.patitoVM.sink.write, check, self.total)
+        trace = Trace(header, path[-1][0], path, source, function)
+        self.traces[header] = trace
+        return trace
+
+    # Function that executes the program. Cold quads are interpreted and hot loops
+    # run their compiled trace every time they jump back.
+    def run(self):
+        patitoVM = self.patitoVM
+        handlers = patitoVM.thread()
+        code = patitoVM.code
+        size = len(handlers)
+        counts = self.counts
+        traces = self.traces
+        threshold = self.threshold
+        limited = patitoVM.limits is not None
+        program_counter = 0
+        # Number of quads executed
+        executed = 0
+        # First quad of the loop being recorded and the quads of its iteration
+        recording = None
+        recorded = []
+
+        try:
+            while program_counter < size:
+                executed += 1
+                next_quad = handlers[program_counter]()
+
+                if recording is not None:
+                    recorded.append((program_counter, next_quad))
+                    if next_quad == recording and program_counter >= recording:
+                        # The iteration ends jumping back to the first quad
+                        self.compile_trace(recording, recorded)
+                        recording = None
+                    elif next_quad <= program_counter or len(recorded) > self.max_trace:
+                        # An inner loop jumped back or the loop is too long
+                        self.rejected.add(recording)
+                        recording = None
+                    elif code[program_counter][3] == recording and code[program_counter][0] in JUMPS:
+                        # The loop ended without jumping back, it's recorded again the next time
+                        recording = None
+
+                if next_quad <= program_counter:
+                    # Limits are checked only when a loop jumps back
+                    if limited:
+                        patitoVM.check_limits(program_counter, executed)
+                    trace = traces.get(next_quad)
+                    if trace is not None:
+                        trace.entries += 1
+                        try:
+                            next_quad = trace.function(executed)
+                        finally:
+                            executed = self.total[0]
+                        trace.exits[next_quad] = trace.exits.get(next_quad, 0) + 1
+                    elif recording is None and next_quad not in self.rejected:
+                        count = counts[next_quad] = counts.get(next_quad, 0) + 1
+                        if count >= threshold:
+                            recording = next_quad
+                            recorded = []
+                program_counter = next_quad
+        finally:
+            patitoVM.executed_quads = executed
+
+    # Print a table with the compiled traces
+    def print_report(self):
+        tabla = []
+        for trace in sorted(self.traces.values(), key=lambda trace: trace.header):
+            tabla.append([trace.header, trace.back_edge, len(trace.path), trace.guards(), trace.entries, trace.side_exits()])
+        print('TRACES')
+        print(tabulate(tabla, headers=['start', 'end', 'quads', 'guards', 'entries', 'side exits'], tablefmt='grid'))
+        print('\n')
+
+
+if __name__ == '__main__':
+    # Imported here because the Virtual Machine uses this module
+    from PatitoOptimizer import PatitoOptimizer
+    from PatitoOutput import PatitoOutput
+    from PatitoVirtualMachine import PatitoVirtualMachine, read_file
+
+    arg_parser = argparse.ArgumentParser(description='Run a Patito program with the tracing JIT and print its traces')
+    arg_parser.add_argument('program')
+    arg_parser.add_argument('--optimize', action='append', choices=PatitoOptimizer.passes, default=[], help='optimization pass to apply (can be repeated)')
+    arg_parser.add_argument('--threshold', type=int, default=HOT_LOOP, help='jumps back to a loop before it is compiled')
+    arg_parser.add_argument('--source', action='store_true', help='print the Python source of every trace')
+    args = arg_parser.parse_args()
+
+    patitoVM = PatitoVirtualMachine(optimizations=args.optimize, output=PatitoOutput())
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaded = patitoVM.load(read_file(args.program))
+    if not loaded:
+        print('Error in Compiler\n', patitoVM.error)
+    else:
+        patitoVM.create_memory_vars()
+        patitoVM.sink = patitoVM.output
+        patitoVM.start_limits()
+        jit = PatitoJIT(patitoVM, args.threshold)
+        jit.run()
+        print(str(patitoVM.executed_quads) + ' quads executed')
+        jit.print_report()
+        if args.source:
+            for trace in sorted(jit.traces.values(), key=lambda trace: trace.header):
+                print(trace.source)
@@ -10,6 +10,7 @@ class PatitoLexer(object):
 
     def build(self, **kwargs):
         self.lexer = lex.lex(object=self,**kwargs)
+        return self.lexer
 
     # List of reserved words
     reserved = {
@@ -0,0 +1,10 @@
+# PatitoLextab.py. This file automatically created by PLY (version 3.11). Don't edit!
+_tabversion   = '3.10'
+_lextokens    = set(('COLON', 'COMMA', 'COUT', 'CTE_FLOAT', 'CTE_INT', 'CTE_STRING', 'DIFFERENT_THAN', 'DIVIDE', 'DO', 'ELIF', 'ELSE', 'END', 'EQUAL', 'FLOAT', 'GREATER_THAN', 'ID', 'IF', 'INT', 'LEFT_BRACE', 'LEFT_PARENTHESIS', 'LESS_THAN', 'MINUS', 'PLUS', 'PROGRAM', 'RIGHT_BRACE', 'RIGHT_PARENTHESIS', 'SEMICOLON', 'TIMES', 'VAR', 'WHILE'))
+_lexreflags   = 64
+_lexliterals  = ''
+_lexstateinfo = {'INITIAL': 'inclusive'}
+_lexstatere   = {'INITIAL': [('(?P<t_CTE_STRING>[\\"|\\\'].*?[\\"|\\\'])|(?P<t_ID>[a-zA-Z_][a-zA-Z_0-9]*)|(?P<t_CTE_FLOAT>[0-9]+\\.[0-9]+)|(?P<t_CTE_INT>[0-9]+)|(?P<t_newline>\\n+)|(?P<t_DIFFERENT_THAN>\\!=)|(?P<t_COLON>\\:)|(?P<t_COMMA>\\,)|(?P<t_DIVIDE>\\/)|(?P<t_EQUAL>\\=)|(?P<t_GREATER_THAN>\\>)|(?P<t_LEFT_BRACE>\\{)|(?P<t_LEFT_PARENTHESIS>\\()|(?P<t_LESS_THAN>\\<)|(?P<t_MINUS>\\-)|(?P<t_PLUS>\\+)|(?P<t_RIGHT_BRACE>\\})|(?P<t_RIGHT_PARENTHESIS>\\))|(?P<t_SEMICOLON>\\;)|(?P<t_TIMES>\\*)', [None, ('t_CTE_STRING', 'CTE_STRING'), ('t_ID', 'ID'), ('t_CTE_FLOAT', 'CTE_FLOAT'), ('t_CTE_INT', 'CTE_INT'), ('t_newline', 'newline'), (None, 'DIFFERENT_THAN'), (None, 'COLON'), (None, 'COMMA'), (None, 'DIVIDE'), (None, 'EQUAL'), (None, 'GREATER_THAN'), (None, 'LEFT_BRACE'), (None, 'LEFT_PARENTHESIS'), (None, 'LESS_THAN'), (None, 'MINUS'), (None, 'PLUS'), (None, 'RIGHT_BRACE'), (None, 'RIGHT_PARENTHESIS'), (None, 'SEMICOLON'), (None, 'TIMES')])]}
+_lexstateignore = {'INITIAL': ' \t'}
+_lexstateerrorf = {'INITIAL': 't_error'}
+_lexstateeoff = {}
@@ -0,0 +1,63 @@
+# ------------------------------------------------------------
+# PatitoLimits.py
+#
+# Limits of a run of the Virtual Machine
+# ------------------------------------------------------------
+
+import time
+
+class PatitoLimits(object):
+
+    def __init__(self, max_quads = None, timeout = None, max_memory = None):
+        # Quads that can be executed. Limits are checked when a loop jumps back,
+        # so a run can go over by the quads of one iteration.
+        self.max_quads = max_quads
+        # Seconds the run can take
+        self.timeout = timeout
+        # Values the memory can have (constants, variables and temporals)
+        self.max_memory = max_memory
+
+    def __repr__(self):
+        return 'PatitoLimits(max_quads=%r, timeout=%r, max_memory=%r)' % (self.max_quads, self.timeout, self.max_memory)
+
+    # Deadline of a run that starts now (None without timeout)
+    def deadline(self, start):
+        if self.timeout is None:
+            return None
+        return start + self.timeout
+
+    # Stop the run if it went over a limit
+    def check(self, program_counter, executed, start, deadline):
+        if self.max_quads is not None and executed > self.max_quads:
+            raise PatitoLimitError('max_quads', program_counter, executed, time.perf_counter() - start)
+        if deadline is not None:
+            now = time.perf_counter()
+            if now > deadline:
+                raise PatitoLimitError('timeout', program_counter, executed, now - start)
+
+    # Stop the run before it starts if the memory is too big
+    def check_memory(self, memory):
+        if self.max_memory is not None and len(memory) > self.max_memory:
+            raise PatitoLimitError('max_memory', 0, 0, 0.0, len(memory))
+
+class PatitoLimitError(Exception):
+
+    def __init__(self, limit, program_counter, executed_quads, elapsed, memory_size = None):
+        Exception.__init__(self, 'Limit ' + limit + ' exceeded at quad ' + str(program_counter))
+        # Name of the limit: max_quads, timeout or max_memory
+        self.limit = limit
+        # Quad that was being executed when the run stopped
+        self.program_counter = program_counter
+        self.executed_quads = executed_quads
+        self.elapsed = elapsed
+        self.memory_size = memory_size
+
+    # Information of the error as a dictionary
+    def as_dict(self):
+        return {
+            'limit': self.limit,
+            'program_counter': self.program_counter,
+            'executed_quads': self.executed_quads,
+            'elapsed': self.elapsed,
+            'memory_size': self.memory_size,
+        }
@@ -0,0 +1,142 @@
+# ------------------------------------------------------------
+# PatitoMemory.py
+#
+# Memory of the Virtual Machine stored by segments of typed arrays
+# ------------------------------------------------------------
+
+from array import array
+from bisect import bisect_right
+
+class TypedMemory(object):
+    # Storage of every segment depending on the type of its values
+    storage = {
+        'const_int': 'int',
+        'const_float': 'float',
+        'const_strings': 'string',
+        'var_int': 'int',
+        'var_float': 'float',
+        'temp_int': 'int',
+        'temp_float': 'float',
+        'temp_bool': 'bool',
+    }
+
+    def __init__(self, memory_const, count_memory):
+        self.segments = list(count_memory.keys())
+        # Index of the memory where every segment starts
+        self.starts = []
+        self.stores = []
+        # Segments that are not typed arrays anymore because a value did not fit
+        self.fallbacks = set()
+        # Bitmap of the values that were written in every segment of variables and temporals
+        # (None for constants). Values never written read as None, like in the list model.
+        self.assigned = []
+
+        position = 0
+        for segment in self.segments:
+            size = count_memory[segment]
+            values = memory_const[position:position + size] if segment.startswith('const') else None
+            self.starts.append(position)
+            self.stores.append(self.create_store(self.storage[segment], size, values))
+            self.assigned.append(None if segment.startswith('const') else bytearray(size))
+            position += size
+        self.size = position
+
+        self.bools = self.segments.index('temp_bool') if 'temp_bool' in self.segments else -1
+
+    # Copy of the memory, cheaper than creating it again from the constants
+    def copy(self):
+        memory = TypedMemory.__new__(TypedMemory)
+        memory.segments = self.segments
+        memory.starts = self.starts
+        memory.size = self.size
+        memory.bools = self.bools
+        memory.stores = [store[:] for store in self.stores]
+        memory.fallbacks = set(self.fallbacks)
+        memory.assigned = [None if assigned is None else assigned[:] for assigned in self.assigned]
+        return memory
+
+    # Create the storage of a segment. Variables are stored as 0 until they are written.
+    def create_store(self, type_var, size, values = None):
+        if type_var == 'int':
+            store = array('q', [0]) * size
+        elif type_var == 'float':
+            store = array('d', [0.0]) * size
+        elif type_var == 'bool':
+            return bytearray(size)
+        else:
+            return list(values) if values is not None else [None] * size
+
+        if values is not None:
+            try:
+                store = array(store.typecode, values)
+            except OverflowError:
+                # Integers bigger than 64 bits stay as Python ints
+                return list(values)
+        return store
+
+    # Get the segment and position inside the segment of an index
+    def locate(self, index):
+        if index < 0 or index >= self.size:
+            raise IndexError('Memory index out of range')
+        # Empty segments share the start with the next one, the last of them is the right one
+        segment = bisect_right(self.starts, index) - 1
+        return segment, index - self.starts[segment]
+
+    def __getitem__(self, index):
+        segment, position = self.locate(index)
+        assigned = self.assigned[segment]
+        if assigned is not None and not assigned[position]:
+            return None
+        value = self.stores[segment][position]
+        if segment == self.bools:
+            return bool(value)
+        return value
+
+    def __setitem__(self, index, value):
+        segment, position = self.locate(index)
+        store = self.stores[segment]
+        try:
+            store[position] = value
+        except (OverflowError, TypeError):
+            # The value does not fit in the typed array (an int bigger than 64 bits),
+            # the segment falls back to a list of Python objects
+            store = list(store)
+            store[position] = value
+            self.stores[segment] = store
+            self.fallbacks.add(self.segments[segment])
+        if self.assigned[segment] is not None:
+            self.assigned[segment][position] = 1
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for segment, store in enumerate(self.stores):
+            assigned = self.assigned[segment]
+            for position, value in enumerate(store):
+                if assigned is not None and not assigned[position]:
+                    yield None
+                else:
+                    yield bool(value) if segment == self.bools else value
+
+    def __repr__(self):
+        return repr(list(self))
+
+    # Approximate number of bytes used by the values of the memory
+    def nbytes(self):
+        total = 0
+        for store in self.stores:
+            if isinstance(store, array):
+                total += store.itemsize * len(store)
+            elif isinstance(store, bytearray):
+                total += len(store)
+            else:
+                total += list_nbytes(store)
+        # One byte per variable and temporal to know if it was written
+        total += sum(len(assigned) for assigned in self.assigned if assigned is not None)
+        return total
+
+# Approximate number of bytes used by the values of a memory stored in a list:
+# a pointer per element plus the boxed object (None is shared)
+def list_nbytes(memory):
+    return sum(8 if value is None else 8 + value.__sizeof__() for value in memory)
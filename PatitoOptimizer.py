@@ -0,0 +1,578 @@
+# ------------------------------------------------------------
+# PatitoOptimizer.py
+#
+# Optimization passes over the quadruples of a Patito program
+# ------------------------------------------------------------
+
+import heapq
+import operator
+from tabulate import tabulate
+from PatitoCFG import back_edges, leaders, successors
+from PatitoParser import PatitoParser, SEGMENTS, CONSTANT_SEGMENTS, JUMPS, compact_directions, relocate_direction, relocate_quads, segment_of
+
+# Segments of temporal variables
+TEMP_SEGMENTS = ('temp_int', 'temp_float', 'temp_bool')
+
+# Segments of constants
+CONST_SEGMENTS = ('const_int', 'const_float', 'const_strings')
+
+# Type of the values stored in every segment
+SEGMENT_TYPES = {
+    'const_int': 'int',
+    'const_float': 'float',
+    'const_strings': 'string',
+    'var_int': 'int',
+    'var_float': 'float',
+    'temp_int': 'int',
+    'temp_float': 'float',
+    'temp_bool': 'bool',
+}
+
+# Functions to evaluate operations with constant operands
+OPERATIONS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '>': operator.gt,
+    '<': operator.lt,
+    '!=': operator.ne,
+}
+
+class PatitoOptimizer(object):
+    # Available passes in the order they are applied
+    passes = ('fold', 'licm', 'fuse', 'temps')
+
+    def __init__(self, quadruples, constants_table, symbol_table, memory_const, count_memory, memory_directions, lines = None):
+        # Copy the compiler output so the original program is not modified
+        self.quadruples = list(quadruples)
+        # Line of the source of every quad, moved together with the quads
+        self.lines = list(lines) if lines is not None else [None] * len(self.quadruples)
+        self.constants_table = {key: dict(constant) for key, constant in constants_table.items()}
+        self.symbol_table = {name: dict(variable) for name, variable in symbol_table.items()}
+        self.memory_const = list(memory_const)
+        self.count_memory = dict(count_memory)
+        # Values of every segment of constants. New constants are added at the end of
+        # their segment and memory_const is created again at the end of the pass.
+        self.constant_values = {}
+        position = 0
+        for segment in CONST_SEGMENTS:
+            self.constant_values[segment] = self.memory_const[position:position + self.count_memory[segment]]
+            position += self.count_memory[segment]
+        self.memory_directions = memory_directions
+        # Information reported by every pass
+        self.stats = {}
+
+        # Work with segments big enough for the constants added by the passes
+        # (at most one per quad). They are compacted again after the passes.
+        size = sum(self.count_memory.values()) + len(self.quadruples) + 1
+        self.relocate({segment: number * size for number, segment in enumerate(SEGMENTS)})
+
+
+    # Apply the selected passes
+    def optimize(self, selected = passes):
+        for name in self.passes:
+            if name in selected:
+                if name == 'fold':
+                    self.fold_constants()
+                elif name == 'licm':
+                    self.hoist_invariants()
+                elif name == 'fuse':
+                    self.fuse_jumps()
+                elif name == 'temps':
+                    self.allocate_temps()
+
+        self.relocate(compact_directions(self.count_memory))
+        return self.quadruples
+
+    # Move every direction of the program to a new layout of segments
+    def relocate(self, directions):
+        self.quadruples = relocate_quads(self.quadruples, self.memory_directions, directions)
+        for table in (self.symbol_table, self.constants_table):
+            for value in table.values():
+                value['memory_dir'] = relocate_direction(value['memory_dir'], self.memory_directions, directions)
+        self.memory_directions = directions
+
+    # Print information of every pass
+    def print_stats(self):
+        if 'fold' in self.stats:
+            print('CONSTANT FOLDING')
+            print(tabulate([list(self.stats['fold'].values())], headers=list(self.stats['fold'].keys()), tablefmt='grid'))
+            print('\n')
+        if 'licm' in self.stats:
+            print('LOOP INVARIANT CODE MOTION')
+            print(tabulate([list(self.stats['licm'].values())], headers=list(self.stats['licm'].keys()), tablefmt='grid'))
+            print('\n')
+        if 'fuse' in self.stats:
+            print('FUSED JUMPS')
+            print(tabulate([list(self.stats['fuse'].values())], headers=list(self.stats['fuse'].keys()), tablefmt='grid'))
+            print('\n')
+        if 'temps' in self.stats:
+            print('TEMPORAL ALLOCATION')
+            tabla = [[segment] + list(values.values()) for segment, values in self.stats['temps'].items()]
+            print(tabulate(tabla, headers=['', 'before', 'after'], tablefmt='grid'))
+            print('\n')
+
+    # Get the segment of a direction
+    def segment_of(self, direction):
+        return segment_of(direction, self.memory_directions)
+
+    # Check if a direction belongs to a constant
+    def is_constant(self, direction):
+        return direction is not None and self.segment_of(direction) in CONST_SEGMENTS
+
+    # Get the value of a constant
+    def constant_value(self, direction):
+        segment = self.segment_of(direction)
+        return self.constant_values[segment][direction - self.memory_directions[segment]]
+
+    # Get the direction of a constant, adding it to the constant table and memory if it's new
+    def add_constant(self, value, type_var):
+        key = (value, type_var)
+        if key in self.constants_table:
+            return self.constants_table[key]['memory_dir']
+
+        segment = CONSTANT_SEGMENTS[type_var]
+        new_dir = self.memory_directions[segment] + self.count_memory[segment]
+        self.constant_values[segment].append(value)
+        self.count_memory[segment] += 1
+
+        self.constants_table[key] = {
+            'type_var': type_var,
+            'memory_dir': new_dir
+        }
+        return new_dir
+
+    # Create the memory of constants again: every type after the previous one
+    def create_memory_const(self):
+        self.memory_const = [value for segment in CONST_SEGMENTS for value in self.constant_values[segment]]
+        return self.memory_const
+
+    # Check if a direction belongs to a temporal variable
+    def is_temp(self, direction):
+        return direction is not None and self.segment_of(direction) in TEMP_SEGMENTS
+
+    # Directions read by a quad
+    def reads(self, quad):
+        operation, operand1, operand2, result = quad
+        return [operand for operand in (operand1, operand2) if operand is not None]
+
+    # Direction written by a quad (None for jumps and prints)
+    def writes(self, quad):
+        operation, operand1, operand2, result = quad
+        if operation in JUMPS or operation == 'cout':
+            return None
+        return result
+
+    # Quads that can run after the quad in program_counter
+    def successors(self, program_counter):
+        return successors(self.quadruples, program_counter)
+
+    # Quads that start a basic block
+    def leaders(self):
+        return leaders(self.quadruples)
+
+    # Remove quads and move the jumps to the quads that are left
+    def remove_quads(self, removed):
+        new_positions = []
+        position = 0
+        for program_counter in range(len(self.quadruples)):
+            new_positions.append(position)
+            if program_counter not in removed:
+                position += 1
+        # A jump to the end of the program keeps going to the end
+        new_positions.append(position)
+
+        quadruples = []
+        for program_counter, (operation, operand1, operand2, result) in enumerate(self.quadruples):
+            if program_counter in removed:
+                continue
+            if operation in JUMPS:
+                result = new_positions[result]
+            quadruples.append((operation, operand1, operand2, result))
+        self.quadruples = quadruples
+        self.lines = [line for program_counter, line in enumerate(self.lines) if program_counter not in removed]
+
+    # Remove operations that write a temporal variable that is never read
+    def remove_dead_temps(self):
+        removed_total = 0
+        while True:
+            read = set()
+            for quad in self.quadruples:
+                read.update(self.reads(quad))
+            removed = set()
+            for program_counter, quad in enumerate(self.quadruples):
+                written = self.writes(quad)
+                if self.is_temp(written) and written not in read:
+                    removed.add(program_counter)
+            if not removed:
+                return removed_total
+            self.remove_quads(removed)
+            removed_total += len(removed)
+
+    # Evaluate operations with constant operands when the program is compiled. Constants
+    # assigned to variables are propagated inside every basic block.
+    def fold_constants(self):
+        size = len(self.quadruples)
+        constants_before = len(self.memory_const)
+        leaders = self.leaders()
+        folded = 0
+        removed = set()
+        # Directions with a known constant (direction of the constant) and temporals with a known bool
+        known = {}
+        known_bools = {}
+
+        for program_counter in range(size):
+            if program_counter in leaders:
+                known = {}
+                known_bools = {}
+
+            operation, operand1, operand2, result = self.quadruples[program_counter]
+            operand1 = known.get(operand1, operand1)
+            operand2 = known.get(operand2, operand2)
+
+            if operation in JUMPS:
+                if operation in ('GoToV', 'GoToF') and operand2 in known_bools:
+                    # The condition is known, the jump is always or never taken
+                    if known_bools[operand2] == (operation == 'GoToV'):
+                        operation, operand2 = 'GoTo', None
+                    else:
+                        removed.add(program_counter)
+                    folded += 1
+                self.quadruples[program_counter] = (operation, operand1, operand2, result)
+                continue
+
+            if operation == 'cout':
+                self.quadruples[program_counter] = (operation, operand1, operand2, result)
+                continue
+
+            # The result is written so its previous value is not known anymore
+            known.pop(result, None)
+            known_bools.pop(result, None)
+
+            if operation == '=':
+                if self.is_constant(operand2):
+                    known[result] = operand2
+            elif (operand1 is None or self.is_constant(operand1)) and self.is_constant(operand2):
+                right_type = SEGMENT_TYPES[self.segment_of(operand2)]
+                right = self.constant_value(operand2)
+                value = None
+                if operand1 is None:
+                    # Change of symbol
+                    result_type = right_type
+                    value = - right
+                else:
+                    left_type = SEGMENT_TYPES[self.segment_of(operand1)]
+                    left = self.constant_value(operand1)
+                    result_type = PatitoParser.cube.get((left_type, right_type, operation))
+                    # Division by zero is left for the virtual machine to report
+                    if result_type is not None and not (operation == '/' and right == 0):
+                        value = OPERATIONS[operation](left, right)
+
+                if value is not None:
+                    folded += 1
+                    if result_type == 'bool':
+                        known_bools[result] = value
+                    else:
+                        if result_type == 'float':
+                            value = float(value)
+                        constant = self.add_constant(value, result_type)
+                        known[result] = constant
+                        # The operation becomes an assignment, removed later if nobody reads it
+                        operation, operand1, operand2 = '=', None, constant
+
+            self.quadruples[program_counter] = (operation, operand1, operand2, result)
+
+        self.remove_quads(removed)
+        self.remove_dead_temps()
+        self.create_memory_const()
+
+        self.stats['fold'] = {
+            'folded': folded,
+            'removed': size - len(self.quadruples),
+            'constants': len(self.memory_const) - constants_before,
+        }
+        return self.stats['fold']
+
+    # Loops of the program as (first quad, quad of the back-edge), from the smallest one
+    def loops(self):
+        return sorted(back_edges(self.quadruples), key=lambda loop: (loop[1] - loop[0], loop[0]))
+
+    # Move operations that give the same result in every iteration of a do-while
+    # before the loop. An operation is moved if its result is a temporal defined only
+    # once, its operands are not written inside the loop and it runs in every iteration.
+    # Every loop is checked with the liveness of the program before the pass, from the
+    # smallest one, and the quads of all the loops are moved at the end.
+    def hoist_invariants(self):
+        loops = self.loops()
+        live_in, live_out = self.live_blocks()
+        count_definitions = {}
+        for quad in self.quadruples:
+            written = self.writes(quad)
+            if self.is_temp(written):
+                count_definitions[written] = count_definitions.get(written, 0) + 1
+
+        # Loop where every moved quad goes. An outer loop can take the quads of an inner one.
+        destination = {}
+        for start, end in loops:
+            for program_counter in self.invariants(start, end, live_in[start], count_definitions):
+                destination[program_counter] = (start, end)
+        self.hoist(destination)
+
+        self.stats['licm'] = {
+            'loops': len(loops),
+            'hoisted': len(destination),
+        }
+        return self.stats['licm']
+
+    # Quads of a loop that can be moved before it
+    def invariants(self, start, end, live_at_start, count_definitions):
+        written = set()
+        for program_counter in range(start, end + 1):
+            written.add(self.writes(self.quadruples[program_counter]))
+
+        # Quads that can be skipped by a forward jump inside the loop
+        skipped = set()
+        for program_counter in range(start, end + 1):
+            operation, operand1, operand2, result = self.quadruples[program_counter]
+            if operation in JUMPS and result > program_counter + 1:
+                skipped.update(range(program_counter + 1, min(result, end + 1)))
+
+        # Quads that can be moved when their operands are not written in the loop anymore,
+        # with the number of operands that still are and the quads that read every direction
+        pending = {}
+        readers = {}
+        ready = []
+        for program_counter in range(start, end + 1):
+            if program_counter in skipped:
+                continue
+            quad = self.quadruples[program_counter]
+            operation, operand1, operand2, result = quad
+            # Division is not moved because it can fail
+            if operation not in OPERATIONS or operation == '/':
+                continue
+            if not self.is_temp(result) or count_definitions.get(result) != 1 or result in live_at_start:
+                continue
+            blocking = {operand for operand in self.reads(quad) if operand in written}
+            if not blocking:
+                ready.append(program_counter)
+                continue
+            pending[program_counter] = len(blocking)
+            for operand in blocking:
+                readers.setdefault(operand, []).append(program_counter)
+
+        hoisted = set()
+        while ready:
+            program_counter = ready.pop()
+            hoisted.add(program_counter)
+            # The result is now defined outside of the loop
+            for reader in readers.get(self.quadruples[program_counter][3], ()):
+                pending[reader] -= 1
+                if pending[reader] == 0:
+                    ready.append(reader)
+        return hoisted
+
+    # Move quads to a preheader before the first quad of their loop. destination has
+    # the loop (first quad, quad of the back-edge) of every quad that is moved.
+    def hoist(self, destination):
+        size = len(self.quadruples)
+        # Quads of every preheader by the first quad and the end of its loop
+        preheaders = {}
+        for program_counter in sorted(destination):
+            start, end = destination[program_counter]
+            preheaders.setdefault(start, {}).setdefault(end, []).append(program_counter)
+
+        # Outer loops that start in the same quad have their preheader first. entries has
+        # the end of the loop and the position of the preheader of every loop by its first quad.
+        order = []
+        entries = {}
+        new_positions = [None] * size
+        for program_counter in range(size):
+            if program_counter in preheaders:
+                entries[program_counter] = []
+                for end in sorted(preheaders[program_counter], reverse=True):
+                    entries[program_counter].append((end, len(order)))
+                    order += preheaders[program_counter][end]
+            if program_counter not in destination:
+                new_positions[program_counter] = len(order)
+                order.append(program_counter)
+
+        # First quad from every quad that is left in its place or starts a preheader
+        next_stop = [size] * (size + 1)
+        for program_counter in range(size - 1, -1, -1):
+            if program_counter in entries or program_counter not in destination:
+                next_stop[program_counter] = program_counter
+            else:
+                next_stop[program_counter] = next_stop[program_counter + 1]
+
+        # Position where a jump continues. A moved quad is skipped, and a jump from outside
+        # of a loop to its first quad enters by the preheader.
+        def jump_position(source, target):
+            program_counter = next_stop[target]
+            while program_counter < size:
+                for end, position in entries.get(program_counter, ()):
+                    if not program_counter <= source <= end:
+                        return position
+                if program_counter not in destination:
+                    return new_positions[program_counter]
+                program_counter = next_stop[program_counter + 1]
+            return len(order)
+
+        quadruples = []
+        for program_counter in order:
+            operation, operand1, operand2, result = self.quadruples[program_counter]
+            if operation in JUMPS:
+                result = jump_position(program_counter, result)
+            quadruples.append((operation, operand1, operand2, result))
+        self.quadruples = quadruples
+        self.lines = [self.lines[program_counter] for program_counter in order]
+
+    # Join a comparison and the GoToF or GoToV that reads its result in one jump that
+    # compares the operands. The bool temporal must not be read anywhere else.
+    def fuse_jumps(self):
+        leaders = self.leaders()
+        count_reads = {}
+        for quad in self.quadruples:
+            for operand in self.reads(quad):
+                count_reads[operand] = count_reads.get(operand, 0) + 1
+
+        removed = set()
+        for program_counter in range(len(self.quadruples) - 1):
+            operation, operand1, operand2, result = self.quadruples[program_counter]
+            jump, _, condition, target = self.quadruples[program_counter + 1]
+            if operation not in ('>', '<', '!=') or jump not in ('GoToV', 'GoToF'):
+                continue
+            # Other quads could jump to the GoTo without running the comparison
+            if program_counter + 1 in leaders or program_counter in removed:
+                continue
+            if condition != result or not self.is_temp(result) or count_reads.get(result) != 1:
+                continue
+            self.quadruples[program_counter] = (jump + operation, operand1, operand2, target)
+            removed.add(program_counter + 1)
+
+        self.remove_quads(removed)
+        self.stats['fuse'] = {
+            'fused': len(removed),
+        }
+        return self.stats['fuse']
+
+    # Temporal variables that are alive when every basic block starts and ends, by the
+    # first quad of the block. Sets are kept for the blocks and not for every quad.
+    def live_blocks(self):
+        size = len(self.quadruples)
+        starts = sorted(self.leaders())
+        # Temporals read before they are written and temporals written in every block
+        uses = {}
+        definitions = {}
+        following = {}
+        predecessors = {start: [] for start in starts}
+        for number, start in enumerate(starts):
+            end = starts[number + 1] if number + 1 < len(starts) else size
+            used = set()
+            defined = set()
+            for quad in self.quadruples[start:end]:
+                for operand in self.reads(quad):
+                    if self.is_temp(operand) and operand not in defined:
+                        used.add(operand)
+                written = self.writes(quad)
+                if self.is_temp(written):
+                    defined.add(written)
+            uses[start] = used
+            definitions[start] = defined
+            following[start] = [block for block in self.successors(end - 1) if block < size]
+            for block in following[start]:
+                predecessors[block].append(start)
+
+        live_in = {start: set(uses[start]) for start in starts}
+        live_out = {start: set() for start in starts}
+        # Start from the last block so most of the information flows in one pass
+        pending = list(starts)
+        queued = set(starts)
+        while pending:
+            start = pending.pop()
+            queued.discard(start)
+            live = set()
+            for block in following[start]:
+                live |= live_in[block]
+            live_out[start] = live
+            live = uses[start] | (live - definitions[start])
+            if live != live_in[start]:
+                live_in[start] = live
+                for block in predecessors[start]:
+                    if block not in queued:
+                        queued.add(block)
+                        pending.append(block)
+        return live_in, live_out
+
+    # Interval of quads where every temporal is defined or alive
+    def live_intervals(self):
+        live_in, live_out = self.live_blocks()
+        starts = sorted(live_out)
+        intervals = {}
+
+        def extend(temp, program_counter):
+            start, end = intervals.get(temp, (program_counter, program_counter))
+            intervals[temp] = (min(start, program_counter), max(end, program_counter))
+
+        for number, start in enumerate(starts):
+            end = starts[number + 1] if number + 1 < len(starts) else len(self.quadruples)
+            # Go backwards from the end of the block. A temporal is extended when it
+            # starts to be alive and when it stops (where it's written or at the start).
+            live = set(live_out[start])
+            for temp in live:
+                extend(temp, end - 1)
+            for program_counter in range(end - 1, start - 1, -1):
+                quad = self.quadruples[program_counter]
+                written = self.writes(quad)
+                if self.is_temp(written):
+                    extend(written, program_counter)
+                    live.discard(written)
+                for operand in self.reads(quad):
+                    if self.is_temp(operand) and operand not in live:
+                        extend(operand, program_counter)
+                        live.add(operand)
+            for temp in live:
+                extend(temp, start)
+        return intervals
+
+    # Reuse temporal variables. Every temporal gets the interval of quads where it is
+    # defined or alive, and intervals that don't overlap share the same direction.
+    def allocate_temps(self):
+        intervals = self.live_intervals()
+
+        # Linear scan in every segment
+        new_directions = {}
+        stats = {}
+        for segment in TEMP_SEGMENTS:
+            temps = sorted((interval, temp) for temp, interval in intervals.items() if self.segment_of(temp) == segment)
+            active = []
+            free = []
+            high_water = 0
+            for (start, end), temp in temps:
+                # Release the slots of temporals that are not alive anymore
+                while active and active[0][0] <= start:
+                    _, slot = heapq.heappop(active)
+                    heapq.heappush(free, slot)
+                if free:
+                    slot = heapq.heappop(free)
+                else:
+                    slot = high_water
+                    high_water += 1
+                heapq.heappush(active, (end, slot))
+                new_directions[temp] = self.memory_directions[segment] + slot
+
+            stats[segment] = {'before': self.count_memory[segment], 'after': high_water}
+            self.count_memory[segment] = high_water
+
+        # Rewrite quads with the new directions
+        quadruples = []
+        for operation, operand1, operand2, result in self.quadruples:
+            operand1 = new_directions.get(operand1, operand1)
+            operand2 = new_directions.get(operand2, operand2)
+            if operation not in JUMPS:
+                result = new_directions.get(result, result)
+            quadruples.append((operation, operand1, operand2, result))
+        self.quadruples = quadruples
+
+        self.stats['temps'] = stats
+        return stats
@@ -0,0 +1,80 @@
+# ------------------------------------------------------------
+# PatitoOutput.py
+#
+# Output of the programs executed by the Virtual Machine
+# ------------------------------------------------------------
+
+import sys
+
+class PatitoOutput(object):
+
+    def __init__(self, target = None, buffer_size = 8192, capture = False, on_close = None):
+        # Function that receives the text when the buffer is flushed (None to only capture it)
+        self.target = target
+        # Function called when the output is closed
+        self.on_close = on_close
+        self.buffer_size = buffer_size
+        # Text waiting to be flushed
+        self.parts = []
+        self.size = 0
+        # Text already flushed, kept to return it to the caller
+        self.captured = [] if capture else None
+
+    # Add text to the buffer, it's flushed when the buffer is full
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    # Send the text of the buffer to the target
+    def flush(self):
+        if not self.parts:
+            return
+        text = ''.join(self.parts)
+        self.parts = []
+        self.size = 0
+        if self.captured is not None:
+            self.captured.append(text)
+        if self.target is not None:
+            self.target(text)
+
+    # Flush the buffer and release the target
+    def close(self):
+        self.flush()
+        if self.on_close is not None:
+            self.on_close()
+            self.on_close = None
+
+    # Get all the captured text (None if the output does not capture)
+    def getvalue(self):
+        if self.captured is None:
+            return None
+        self.flush()
+        return ''.join(self.captured)
+
+# Output to the standard output. sys.stdout is looked up on every flush.
+def stdout_output(buffer_size = 8192, capture = False):
+    def target(text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+    return PatitoOutput(target, buffer_size, capture)
+
+# Output to a file, receives a path (the file is closed with the output) or an open file
+def file_output(file, buffer_size = 8192, capture = False):
+    on_close = None
+    if isinstance(file, str):
+        file = open(file, 'w')
+        on_close = file.close
+    def target(text):
+        file.write(text)
+        file.flush()
+    return PatitoOutput(target, buffer_size, capture, on_close)
+
+# Output kept in memory, the text is read with getvalue()
+def buffer_output():
+    return PatitoOutput(None, sys.maxsize, True)
+
+# Output sent to a function that receives the text of every flush
+def callback_output(callback, buffer_size = 8192, capture = False):
+    return PatitoOutput(callback, buffer_size, capture)
@@ -4,71 +4,87 @@
 # Parser for rules defined for Patito language
 # ------------------------------------------------------------
 
+import os
 import ply.yacc as yacc
 from tabulate import tabulate
 from PatitoLexer import PatitoLexer
+from PatitoTimings import measure
+
+# Version of the compiler output. Change it when the generated quads change.
+COMPILER_VERSION = '4'
+
+# Segments of memory in the order they are stored
+SEGMENTS = ('const_int', 'const_float', 'const_strings', 'var_int', 'var_float', 'temp_int', 'temp_float', 'temp_bool')
+
+# Segment of the constants of every type
+CONSTANT_SEGMENTS = {
+    'int': 'const_int',
+    'float': 'const_float',
+    'string': 'const_strings',
+}
+
+# Maximum number of directions of a segment while the program is compiled
+SEGMENT_SIZE = 1000000
+
+# Jumps that compare two operands and jump if the comparison is true (GoToV) or false (GoToF)
+FUSED_JUMPS = ('GoToV>', 'GoToV<', 'GoToV!=', 'GoToF>', 'GoToF<', 'GoToF!=')
+
+# Operations that move the program counter. Their result is the number of a quad.
+JUMPS = ('GoTo', 'GoToV', 'GoToF') + FUSED_JUMPS
 
 class PatitoParser(object):
+    # Semantic Cube
+    cube = {
+        ('int', 'int', '+'): 'int',
+        ('int', 'int', '-'): 'int',
+        ('int', 'int', '*'): 'int',
+        ('int', 'int', '/'): 'float',
+        ('int', 'int', '>'): 'bool',
+        ('int', 'int', '<'): 'bool',
+        ('int', 'int', '!='): 'bool',
+        ('int', 'int', '='): 'int',
+        ('int', 'float', '+'): 'float',
+        ('int', 'float', '-'): 'float',
+        ('int', 'float', '*'): 'float',
+        ('int', 'float', '/'): 'float',
+        ('int', 'float', '>'): 'bool',
+        ('int', 'float', '<'): 'bool',
+        ('int', 'float', '!='): 'bool',
+        ('float', 'float', '+'): 'float',
+        ('float', 'float', '-'): 'float',
+        ('float', 'float', '*'): 'float',
+        ('float', 'float', '/'): 'float',
+        ('float', 'float', '>'): 'bool',
+        ('float', 'float', '<'): 'bool',
+        ('float', 'float', '!='): 'bool',
+        ('float', 'float', '='): 'int',
+        ('float', 'int', '+'): 'float',
+        ('float', 'int', '-'): 'float',
+        ('float', 'int', '*'): 'float',
+        ('float', 'int', '/'): 'float',
+        ('float', 'int', '>'): 'bool',
+        ('float', 'int', '<'): 'bool',
+        ('float', 'int', '!='): 'bool',
+    }
+
+    def __init__(self, segment_size = SEGMENT_SIZE):
+        # Every segment has segment_size directions while compiling. At the end
+        # the segments are compacted to the number of directions they use.
+        self.segment_size = segment_size
+        self.segment_directions = {segment: number * segment_size for number, segment in enumerate(SEGMENTS)}
 
-    def __init__(self):
         # Initialization of stacks, queues and tables
-        self.symbol_table = {}
-        self.quadruplos = []
-        self.stack_operands = []
-        self.stack_operators = []
-        self.stack_types = []
-        self.stack_jumps = []
-        self.count_quads = 0
-        self.symbol_factor = None
+        self.reset()
+
+        # Parser and lexer are built on the first parse and reused after it
+        self.parser = None
+        self.lexer = None
+        # Timings of the phases of the compiler (PatitoTimings), None to not measure them
+        self.timings = None
         
         # Get information from lexer
         self.tokens = PatitoLexer.tokens
 
-        self.memory_directions = {
-            'const_int': 0,
-            'const_float': 500,
-            'const_strings': 1000,
-            'var_int': 1500,
-            'var_float': 2000,
-            'temp_int': 2500,
-            'temp_float': 3000,
-            'temp_bool': 3500,
-        }
-
-        # Semantic Cube
-        self.cube = {
-            ('int', 'int', '+'): 'int',
-            ('int', 'int', '-'): 'int',
-            ('int', 'int', '*'): 'int',
-            ('int', 'int', '/'): 'float',
-            ('int', 'int', '>'): 'bool',
-            ('int', 'int', '<'): 'bool',
-            ('int', 'int', '!='): 'bool',
-            ('int', 'int', '='): 'int',
-            ('int', 'float', '+'): 'float',
-            ('int', 'float', '-'): 'float',
-            ('int', 'float', '*'): 'float',
-            ('int', 'float', '/'): 'float',
-            ('int', 'float', '>'): 'bool',
-            ('int', 'float', '<'): 'bool',
-            ('int', 'float', '!='): 'bool',
-            ('float', 'float', '+'): 'float',
-            ('float', 'float', '-'): 'float',
-            ('float', 'float', '*'): 'float',
-            ('float', 'float', '/'): 'float',
-            ('float', 'float', '>'): 'bool',
-            ('float', 'float', '<'): 'bool',
-            ('float', 'float', '!='): 'bool',
-            ('float', 'float', '='): 'int',
-            ('float', 'int', '+'): 'float',
-            ('float', 'int', '-'): 'float',
-            ('float', 'int', '*'): 'float',
-            ('float', 'int', '/'): 'float',
-            ('float', 'int', '>'): 'bool',
-            ('float', 'int', '<'): 'bool',
-            ('float', 'int', '!='): 'bool',
-        }
-
     # Print information
     def print_res(self):
         if self.error == '':
@@ -90,7 +106,7 @@ class PatitoParser(object):
         if len(self.constants_table) > 0:
             print('CONSTANTS TABLE')
             # Convert the dictionary into nested lists
-            tabla = [[clave] + list(valores.values()) for clave, valores in self.constants_table.items()]
+            tabla = [[clave[0]] + list(valores.values()) for clave, valores in self.constants_table.items()]
 
             # Get keys as headers
             encabezados = [''] + list(next(iter(self.constants_table.values())).keys())
@@ -119,46 +135,92 @@ class PatitoParser(object):
             print(tabulate(tabla, headers=encabezados, tablefmt='grid'))
             print('\n')
 
+    # Build parser and lexer. The tables are read from the pre-generated
+    # modules PatitoParsetab and PatitoLextab (they are written if missing).
+    def build(self):
+        output_dir = os.path.dirname(os.path.abspath(__file__))
+        with measure(self.timings, 'parser tables'):
+            self.parser = yacc.yacc(module=self, start='program', tabmodule='PatitoParsetab', outputdir=output_dir, debug=False)
+        with measure(self.timings, 'lexer build'):
+            self.lexer = PatitoLexer().build(optimize=1, lextab='PatitoLextab', outputdir=output_dir)
+
+    # Set errors, stacks and tables as empty before every parse
+    def reset(self):
+        self.error = ''
+        self.symbol_table = {}
+        self.quadruplos = []
+        # Line of the source that generated every quad, and line of the last token used by a rule
+        self.quad_lines = []
+        self.line = 1
+        self.stack_operands = []
+        self.stack_operators = []
+        self.stack_types = []
+        self.stack_jumps = []
+        self.count_quads = 0
+        self.symbol_factor = None
+
+        self.count_memory = {
+            'const_int': 0,
+            'const_float': 0,
+            'const_strings': 0,
+            'var_int': 0,
+            'var_float': 0,
+            'temp_int': 0,
+            'temp_float': 0,
+            'temp_bool': 0
+        }
+
+        # Constants by value and type, and values of every segment of constants
+        self.constants_table = {}
+        self.constant_values = {
+            'const_int': [],
+            'const_float': [],
+            'const_strings': []
+        }
+        self.memory = []
+        self.memory_directions = self.segment_directions
+        self.untyped_variables = []
+
+    # Give every segment only the directions it uses, one after the other
+    def compact(self):
+        directions = compact_directions(self.count_memory)
+        self.quadruplos = relocate_quads(self.quadruplos, self.memory_directions, directions)
+        for table in (self.symbol_table, self.constants_table):
+            for value in table.values():
+                value['memory_dir'] = relocate_direction(value['memory_dir'], self.memory_directions, directions)
+        self.memory_directions = directions
+
+    # Stop compiling if a segment has no more directions
+    def check_segment(self, segment):
+        if self.count_memory[segment] >= self.segment_size:
+            self.error += 'ERROR. Too many directions in ' + segment + ' (maximum ' + str(self.segment_size) + ').\n'
+            raise yacc.YaccError('Segment overflow')
+
     def parse(self, data, print_flag = False):
         # Creation of parser and lexer
         try:
-            parser = yacc.yacc(module=self, start='program')
-            self.lexer = PatitoLexer().build()
-
-            # Set errors and symbol table as empty
-            self.error = ''
-            self.symbol_table = {}
-            self.quadruplos = []
-            self.stack_operands = []
-            self.stack_operators = []
-            self.stack_types = []
-            self.stack_jumps = []
-            self.count_quads = 0
-            self.symbol_factor = None
-
-            self.count_memory = {
-                'const_int': 0,
-                'const_float': 0,
-                'const_strings': 0,
-                'var_int': 0,
-                'var_float': 0,
-                'temp_int': 0,
-                'temp_float': 0,
-                'temp_bool': 0
-            }
+            if self.parser is None:
+                self.build()
 
-            self.constants_table = {}
-            self.memory = []
+            self.reset()
+            self.lexer.lineno = 1
 
-            # Parse the program and print the symbol table.
-            parser.parse(data)
+            # Parse the program and print the symbol table. Quads are generated
+            # by the rules of the parser, so they are measured with the parse.
+            with measure(self.timings, 'parse'):
+                self.parser.parse(data, lexer=self.lexer)
+            with measure(self.timings, 'constants'):
+                self.create_memory_const()
 
             if (self.error != ''):
                 print('\nWRONG PROGRAM :(')
                 print(self.error)
             else:
+                with measure(self.timings, 'compact'):
+                    self.compact()
                 if print_flag:
-                    self.print_res()
+                    with measure(self.timings, 'print'):
+                        self.print_res()
 
             return self.quadruplos, self.constants_table, self.symbol_table, self.memory, self.count_memory, self.memory_directions, self.error
 
@@ -182,10 +244,12 @@ class PatitoParser(object):
     # Function which receives 4 args, creates quad and add 1 to count_quads
     def aux_generate_quad(self, quad1, quad2, quad3, quad4):
         self.quadruplos.append((quad1, quad2, quad3, quad4))
+        self.quad_lines.append(self.line)
         self.count_quads += 1
     
     # Function which creates a new memory space for temporal variable
     def add_count_memory(self, result_type, temp = False):
+        self.check_segment(result_type)
         new_dir = self.memory_directions[result_type] + self.count_memory[result_type]
         self.count_memory[result_type] += 1
         if temp:
@@ -199,38 +263,27 @@ class PatitoParser(object):
             self.stack_types.append(result_type)
         return new_dir   
     
-    def add_constant_to_memory(self, type_dir):
-        new_dir = self.memory_directions[type_dir] + self.count_memory[type_dir]
-
-        if type_dir == 'const_int':
-            index = self.count_memory['const_int']
-        elif type_dir == 'const_float':
-            index = self.count_memory['const_int'] + self.count_memory['const_float']
-        elif type_dir == 'const_strings':
-            index = self.count_memory['const_int'] + self.count_memory['const_float'] + self.count_memory['const_strings']
-        else:
-            self.error += 'Error. Direction type does not exist'
+    # Get the direction of a constant, adding it to the constant table and memory if it's new.
+    # Constants are found by value and type, so 1 and 1.0 are different constants.
+    def add_constant(self, value, type_var):
+        key = (value, type_var)
+        if key not in self.constants_table:
+            type_dir = CONSTANT_SEGMENTS[type_var]
+            self.check_segment(type_dir)
+            new_dir = self.memory_directions[type_dir] + self.count_memory[type_dir]
+            self.count_memory[type_dir] += 1
+            self.constant_values[type_dir].append(value)
+
+            self.constants_table[key] = {
+                'type_var': type_var,
+                'memory_dir': new_dir
+            }
+        return self.constants_table[key]['memory_dir']
 
-        self.count_memory[type_dir] += 1
-        
-        self.memory.insert(index, None)
-        return new_dir
-
-    # Find constant in memory receiving a direction
-    def find_cnst_in_memory(self, find_dir, type_dir):
-        if type_dir == 'const_int':
-            index = find_dir - self.memory_directions['const_int']
-        elif type_dir == 'const_float':
-            index = self.count_memory['const_int'] + (find_dir - self.memory_directions['const_float'])
-        elif type_dir == 'const_strings':
-            index = self.count_memory['const_int'] +  self.count_memory['const_float'] + (find_dir - self.memory_directions['const_strings'])
-        
-        return index
-    
-    # Fill memory direction with certail value
-    def fill_memory(self, memory_dir, value, type_dir):
-        index = self.find_cnst_in_memory(memory_dir, type_dir)
-        self.memory[index] = value
+    # Create the memory of constants: every type after the previous one
+    def create_memory_const(self):
+        self.memory = self.constant_values['const_int'] + self.constant_values['const_float'] + self.constant_values['const_strings']
+        return self.memory
     
     # Function which generates quad depending on the type of quad.
     # Valid type_quad = {operation, assign, change_symbol, GotoF, GoToV, GoTo, cout}
@@ -280,9 +333,9 @@ class PatitoParser(object):
             operator = self.symbol_factor
             self.symbol_factor = None
             
-            # Get expected result
-            result_type = right_type
-            result = self.add_temporal_memory(result_type)
+            # Get expected result and add it to the operands stack
+            result_type = 'temp_' + right_type
+            result = self.add_count_memory(result_type, True)
 
             # Generate quad with None left_operand 
             self.aux_generate_quad(operator, left_operand, right_operand, result)
@@ -346,6 +399,8 @@ class PatitoParser(object):
                 'type_var': None,
                 'memory_dir': None
             }
+            # The type is known when the type of the declaration is reduced
+            self.untyped_variables.append(variable_name)
     
     def p_p(self, p):
         '''p : COMMA o
@@ -362,14 +417,14 @@ class PatitoParser(object):
         # Get data type
         variable_type = p[1]
 
-        # For each variable that has variable type None add the type of variable obtained
-        for key in self.symbol_table:
-            if self.symbol_table[key]['type_var'] is None:
-                self.symbol_table[key]['type_var'] = variable_type
-                if variable_type == 'int':
-                    self.symbol_table[key]['memory_dir'] = self.add_count_memory('var_int')
-                elif variable_type == 'float':
-                    self.symbol_table[key]['memory_dir'] = self.add_count_memory('var_float')
+        # For each variable of the declaration add the type of variable obtained
+        for key in self.untyped_variables:
+            self.symbol_table[key]['type_var'] = variable_type
+            if variable_type == 'int':
+                self.symbol_table[key]['memory_dir'] = self.add_count_memory('var_int')
+            elif variable_type == 'float':
+                self.symbol_table[key]['memory_dir'] = self.add_count_memory('var_float')
+        self.untyped_variables = []
         
     # Body definition
     def p_body(self, p):
@@ -389,6 +444,7 @@ class PatitoParser(object):
     # Assign definition
     def p_assign(self, p):
         'assign : id_assign equal_assign expresion SEMICOLON'
+        self.line = p.lineno(4)
         self.generate_quad('assign')
 
     def p_id_assign(self, p):
@@ -414,17 +470,9 @@ class PatitoParser(object):
     def p_print(self, p):
         'print : COUT LEFT_PARENTHESIS j RIGHT_PARENTHESIS SEMICOLON'
         # If the print statement ends add line_break to operands and generate quad
-        if 'line_break' not in self.constants_table:
-            new_dir = self.add_constant_to_memory('const_strings')
-            self.fill_memory(new_dir, 'line_break', 'const_strings')
-
-            self.constants_table['line_break'] = {
-                'type_var': 'string',
-                'memory_dir': new_dir
-        }
-
-        memory_dir = self.constants_table['line_break']['memory_dir']
+        memory_dir = self.add_constant('line_break', 'string')
         self.stack_operands.append(memory_dir)
+        self.line = p.lineno(5)
         self.generate_quad('cout')
 
     def p_j(self, p):
@@ -435,16 +483,7 @@ class PatitoParser(object):
                 | CTE_STRING'''
         # If it's a string add it to the constant table and to operands
         if p[1] is not None:
-            if p[1] not in self.constants_table:
-                new_dir = self.add_constant_to_memory('const_strings')
-                self.fill_memory(new_dir, p[1], 'const_strings')
-
-                self.constants_table[p[1]] = {
-                    'type_var': 'string',
-                    'memory_dir': new_dir
-            }
-            
-            memory_dir = self.constants_table[p[1]]['memory_dir']
+            memory_dir = self.add_constant(p[1], 'string')
             self.stack_operands.append(memory_dir)
             self.stack_types.append('string')
 
@@ -455,17 +494,9 @@ class PatitoParser(object):
     def p_comma(self, p):
         'comma : COMMA'
         # If the print statement has a comma ad blank_space to operands and generate qiad
-        if 'blank_space' not in self.constants_table:
-            new_dir = self.add_constant_to_memory('const_strings')
-            self.fill_memory(new_dir, 'blank_space', 'const_strings')
-
-            self.constants_table['blank_space'] = {
-                'type_var': 'string',
-                'memory_dir': new_dir
-        }
-
-        memory_dir = self.constants_table['blank_space']['memory_dir']
+        memory_dir = self.add_constant('blank_space', 'string')
         self.stack_operands.append(memory_dir)
+        self.line = p.lineno(1)
         self.generate_quad('cout')
         
     # Cycle definition
@@ -480,6 +511,7 @@ class PatitoParser(object):
     def p_right_par_cycle(self, p):
         'right_par_cycle : RIGHT_PARENTHESIS'
         # Generate quad to jump if the condition is true
+        self.line = p.lineno(1)
         self.generate_quad('GoToV', str(p.lineno(1)))
 
     # Expresion definition
@@ -517,6 +549,7 @@ class PatitoParser(object):
     def p_right_par_cond(self, p):
         'right_par_cond : RIGHT_PARENTHESIS'
         # Generate a GoToF quad and send line number in case an error occurs
+        self.line = p.lineno(1)
         self.generate_quad('GoToF', str(p.lineno(1)))
 
     def p_v(self, p):
@@ -530,6 +563,7 @@ class PatitoParser(object):
     def p_elif(self, p):
         'elif : ELIF'
         # Generate a GoTo quad and fill GoToF quad
+        self.line = p.lineno(1)
         self.generate_quad('GoTo')
         false_jump = self.stack_jumps.pop()
         self.stack_jumps.append(self.count_quads - 1)
@@ -538,6 +572,7 @@ class PatitoParser(object):
     def p_else(self, p):
         'else : ELSE'
         # Generate a GoTo quad and fill GoToF quad
+        self.line = p.lineno(1)
         self.generate_quad('GoTo')
         false_jump = self.stack_jumps.pop()
         self.stack_jumps.append(self.count_quads - 1)
@@ -560,6 +595,7 @@ class PatitoParser(object):
         '''right_par_fact : RIGHT_PARENTHESIS'''
         # Remove ( from the stack
         self.stack_operators.pop()
+        self.line = p.lineno(1)
 
     
     def p_e(self, p):
@@ -587,6 +623,7 @@ class PatitoParser(object):
                 
             self.stack_operands.append(self.symbol_table[variable]['memory_dir'])
             self.stack_types.append(self.symbol_table[variable]['type_var'])
+            self.line = p.lineno(1)
 
             if self.symbol_factor is not None:
             # Add variable to operands stack and type to types stack
@@ -632,37 +669,24 @@ class PatitoParser(object):
                 | CTE_FLOAT'''
         cte = p[1]
 
-        if cte not in self.constants_table:
-            # Add it's type to the stack and add number to constant table
-            if isinstance(cte, int):
-                type_var = 'int'
-                new_dir = self.add_constant_to_memory('const_int')
-                self.fill_memory(new_dir, cte, 'const_int')
-
-            elif isinstance(cte, float):
-                type_var = 'float'
-                new_dir = self.add_constant_to_memory('const_float')
-                self.fill_memory(new_dir, cte, 'const_float')
-
-            else:
-                self.error += 'Constant ', cte, ' is not int or float.'
-                raise yacc.YaccError('Constant ', cte, ' is not int or float.')
-            
-            self.constants_table[cte] = {
-                    'type_var': type_var,
-                    'memory_dir': new_dir
-            }
-
-        memory_dir = self.constants_table[cte]['memory_dir']
-        type_var = self.constants_table[cte]['type_var']
-
-        if self.symbol_factor is not None:
-            # Add variable to operands stack and type to types stack
-                self.generate_quad('change_symbol')
+        # Get it's type and add number to constant table
+        if isinstance(cte, int):
+            type_var = 'int'
+        elif isinstance(cte, float):
+            type_var = 'float'
+        else:
+            self.error += 'Constant ' + str(cte) + ' is not int or float.\n'
+            raise yacc.YaccError('Constant is not int or float')
+        memory_dir = self.add_constant(cte, type_var)
 
         # Add number to constant table and to operands stack
         self.stack_operands.append(memory_dir)
         self.stack_types.append(type_var)
+        self.line = p.lineno(1)
+
+        if self.symbol_factor is not None:
+            # Change the symbol of the number
+            self.generate_quad('change_symbol')
 
     # Error rule for syntax errors
     def p_error(self, p):
@@ -678,6 +702,54 @@ class PatitoParser(object):
             print("Syntax error: Unexpected end of input")
 
 
+# Directions where every segment starts when they are stored one after the other.
+# With this layout a direction is also its index in the memory array.
+def compact_directions(count_memory):
+    directions = {}
+    start = 0
+    for segment in count_memory:
+        directions[segment] = start
+        start += count_memory[segment]
+    return directions
+
+# Get the segment of a direction. Empty segments start where the next one starts,
+# so the last segment that starts before the direction is the right one.
+def segment_of(direction, memory_directions):
+    found = None
+    for segment, start in memory_directions.items():
+        if direction >= start:
+            found = segment
+    return found
+
+# Move a direction from a layout of segments to another one
+def relocate_direction(direction, old_directions, new_directions):
+    if direction is None:
+        return None
+    segment = segment_of(direction, old_directions)
+    return new_directions[segment] + (direction - old_directions[segment])
+
+# Move the directions of the quads from a layout of segments to another one
+def relocate_quads(quadruples, old_directions, new_directions):
+    relocated = []
+    for operation, operand1, operand2, result in quadruples:
+        operand1 = relocate_direction(operand1, old_directions, new_directions)
+        operand2 = relocate_direction(operand2, old_directions, new_directions)
+        # Jumps keep the number of the quad
+        if operation not in JUMPS:
+            result = relocate_direction(result, old_directions, new_directions)
+        relocated.append((operation, operand1, operand2, result))
+    return relocated
+
+# Parser shared by the whole process, so the tables are built only once
+shared_parser = None
+
+# Get the shared parser, creating it the first time
+def get_parser():
+    global shared_parser
+    if shared_parser is None:
+        shared_parser = PatitoParser()
+    return shared_parser
+
 # Function to read file
 def read_file(file_path):
     file = open(file_path, "r")
@@ -0,0 +1,99 @@
+
+# PatitoParsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'programCOLON COMMA COUT CTE_FLOAT CTE_INT CTE_STRING DIFFERENT_THAN DIVIDE DO ELIF ELSE END EQUAL FLOAT GREATER_THAN ID IF INT LEFT_BRACE LEFT_PARENTHESIS LESS_THAN MINUS PLUS PROGRAM RIGHT_BRACE RIGHT_PARENTHESIS SEMICOLON TIMES VAR WHILEempty :program : PROGRAM ID SEMICOLON r body ENDr : empty\n                | varsvars : VAR nn : o COLON type SEMICOLON qo : ID pp : COMMA o\n                | emptyq : n\n                | emptytype : INT\n                | FLOATbody : LEFT_BRACE m RIGHT_BRACEm : statement m\n                | emptystatement : assign\n                        | condition\n                        | cycle\n                        | printassign : id_assign equal_assign expresion SEMICOLONid_assign : IDequal_assign : EQUALprint : COUT LEFT_PARENTHESIS j RIGHT_PARENTHESIS SEMICOLONj : k lk : expresion\n                | CTE_STRINGl : comma j\n                | emptycomma : COMMAcycle : do body WHILE LEFT_PARENTHESIS expresion right_par_cycle SEMICOLONdo : DOright_par_cycle : RIGHT_PARENTHESISexpresion : exp hh : i exp\n                | emptyi : GREATER_THAN\n                | LESS_THAN\n                | DIFFERENT_THAN condition : IF u g SEMICOLONu : LEFT_PARENTHESIS expresion right_par_cond bodyright_par_cond : RIGHT_PARENTHESISv : else bodyg : elif u v\n                | v\n                | emptyelif : ELIFelse : ELSEfactor : left_par_fact expresion right_par_fact\n                    | e fleft_par_fact : LEFT_PARENTHESISright_par_fact : RIGHT_PARENTHESISe : MINUS\n                | PLUS\n                | emptyf : ID\n                | cteexp : term cc : d exp\n                | emptyd : PLUS\n                | MINUSterm : factor aa : b term\n                | emptyb : TIMES\n                | DIVIDEcte : CTE_INT\n                | CTE_FLOAT'
+    
+_lr_action_items = {'PROGRAM':([0,],[2,]),'$end':([1,14,],[0,-2,]),'ID':([2,8,10,16,18,19,20,21,30,34,35,37,39,48,49,50,51,52,53,67,68,70,72,73,74,76,78,79,81,83,84,91,96,99,101,113,117,],[3,13,26,26,-17,-18,-19,-20,13,-1,-23,-1,-1,-1,87,-51,-53,-54,-55,13,-21,-1,-37,-38,-39,-1,-61,-62,-1,-66,-67,-40,-1,-1,-30,-24,-31,]),'SEMICOLON':([3,32,36,40,41,42,44,45,46,47,54,56,57,69,71,75,77,80,82,86,87,88,89,90,93,97,105,106,107,108,109,110,111,115,116,],[4,-14,-1,67,-12,-13,68,-1,-1,-1,91,-45,-46,-34,-36,-58,-60,-63,-65,-50,-56,-57,-68,-69,-43,113,-35,-59,-64,-49,-52,-44,-41,117,-33,]),'LEFT_BRACE':([4,5,6,7,11,24,27,59,60,67,94,95,102,103,104,],[-1,10,-3,-4,-5,10,-32,10,-48,-1,10,-42,-6,-10,-11,]),'VAR':([4,],[8,]),'END':([9,32,],[14,-14,]),'RIGHT_BRACE':([10,15,16,17,18,19,20,21,33,68,91,113,117,],[-1,32,-1,-16,-17,-18,-19,-20,-15,-21,-40,-24,-31,]),'IF':([10,16,18,19,20,21,68,91,113,117,],[23,23,-17,-18,-19,-20,-21,-40,-24,-31,]),'COUT':([10,16,18,19,20,21,68,91,113,117,],[25,25,-17,-18,-19,-20,-21,-40,-24,-31,]),'DO':([10,16,18,19,20,21,68,91,113,117,],[27,27,-17,-18,-19,-20,-21,-40,-24,-31,]),'COLON':([12,13,29,31,43,],[28,-1,-7,-9,-8,]),'COMMA':([13,45,46,47,64,65,66,69,71,75,77,80,82,86,87,88,89,90,105,106,107,108,109,],[30,-1,-1,-1,101,-26,-27,-34,-36,-58,-60,-63,-65,-50,-56,-57,-68,-69,-35,-59,-64,-49,-52,]),'EQUAL':([22,26,],[35,-22,]),'LEFT_PARENTHESIS':([23,25,34,35,37,39,48,50,55,58,62,70,72,73,74,76,78,79,81,83,84,96,99,101,],[37,39,50,-23,50,50,50,-51,37,-47,96,50,-37,-38,-39,50,-61,-62,50,-66,-67,50,50,-30,]),'INT':([28,],[41,]),'FLOAT':([28,],[42,]),'WHILE':([32,38,],[-14,62,]),'ELIF':([32,36,111,],[-14,58,-41,]),'ELSE':([32,36,92,111,],[-14,60,60,-41,]),'MINUS':([34,35,37,39,46,47,48,50,70,72,73,74,76,78,79,80,81,82,83,84,86,87,88,89,90,96,99,101,107,108,109,],[51,-23,51,51,79,-1,51,-51,51,-37,-38,-39,51,-61,-62,-63,51,-65,-66,-67,-50,-56,-57,-68,-69,51,51,-30,-64,-49,-52,]),'PLUS':([34,35,37,39,46,47,48,50,70,72,73,74,76,78,79,80,81,82,83,84,86,87,88,89,90,96,99,101,107,108,109,],[52,-23,52,52,78,-1,52,-51,52,-37,-38,-39,52,-61,-62,-63,52,-65,-66,-67,-50,-56,-57,-68,-69,52,52,-30,-64,-49,-52,]),'CTE_INT':([34,35,37,39,48,49,50,51,52,53,70,72,73,74,76,78,79,81,83,84,96,99,101,],[-1,-23,-1,-1,-1,89,-51,-53,-54,-55,-1,-37,-38,-39,-1,-61,-62,-1,-66,-67,-1,-1,-30,]),'CTE_FLOAT':([34,35,37,39,48,49,50,51,52,53,70,72,73,74,76,78,79,81,83,84,96,99,101,],[-1,-23,-1,-1,-1,90,-51,-53,-54,-55,-1,-37,-38,-39,-1,-61,-62,-1,-66,-67,-1,-1,-30,]),'CTE_STRING':([39,99,101,],[66,66,-30,]),'GREATER_THAN':([45,46,47,75,77,80,82,86,87,88,89,90,106,107,108,109,],[72,-1,-1,-58,-60,-63,-65,-50,-56,-57,-68,-69,-59,-64,-49,-52,]),'LESS_THAN':([45,46,47,75,77,80,82,86,87,88,89,90,106,107,108,109,],[73,-1,-1,-58,-60,-63,-65,-50,-56,-57,-68,-69,-59,-64,-49,-52,]),'DIFFERENT_THAN':([45,46,47,75,77,80,82,86,87,88,89,90,106,107,108,109,],[74,-1,-1,-58,-60,-63,-65,-50,-56,-57,-68,-69,-59,-64,-49,-52,]),'RIGHT_PARENTHESIS':([45,46,47,61,63,64,65,66,69,71,75,77,80,82,85,86,87,88,89,90,98,100,105,106,107,108,109,112,114,],[-1,-1,-1,95,97,-1,-26,-27,-34,-36,-58,-60,-63,-65,109,-50,-56,-57,-68,-69,-25,-29,-35,-59,-64,-49,-52,116,-28,]),'TIMES':([47,86,87,88,89,90,108,109,],[83,-50,-56,-57,-68,-69,-49,-52,]),'DIVIDE':([47,86,87,88,89,90,108,109,],[84,-50,-56,-57,-68,-69,-49,-52,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'program':([0,],[1,]),'r':([4,],[5,]),'empty':([4,10,13,16,34,36,37,39,45,46,47,48,64,67,70,76,81,96,99,],[6,17,31,17,53,57,53,53,71,77,82,53,100,104,53,53,53,53,53,]),'vars':([4,],[7,]),'body':([5,24,59,94,],[9,38,93,111,]),'n':([8,67,],[11,103,]),'o':([8,30,67,],[12,43,12,]),'m':([10,16,],[15,33,]),'statement':([10,16,],[16,16,]),'assign':([10,16,],[18,18,]),'condition':([10,16,],[19,19,]),'cycle':([10,16,],[20,20,]),'print':([10,16,],[21,21,]),'id_assign':([10,16,],[22,22,]),'do':([10,16,],[24,24,]),'p':([13,],[29,]),'equal_assign':([22,],[34,]),'u':([23,55,],[36,92,]),'type':([28,],[40,]),'expresion':([34,37,39,48,96,99,],[44,61,65,85,112,65,]),'exp':([34,37,39,48,70,76,96,99,],[45,45,45,45,105,106,45,45,]),'term':([34,37,39,48,70,76,81,96,99,],[46,46,46,46,46,46,107,46,46,]),'factor':([34,37,39,48,70,76,81,96,99,],[47,47,47,47,47,47,47,47,47,]),'left_par_fact':([34,37,39,48,70,76,81,96,99,],[48,48,48,48,48,48,48,48,48,]),'e':([34,37,39,48,70,76,81,96,99,],[49,49,49,49,49,49,49,49,49,]),'g':([36,],[54,]),'elif':([36,],[55,]),'v':([36,92,],[56,110,]),'else':([36,92,],[59,59,]),'j':([39,99,],[63,114,]),'k':([39,99,],[64,64,]),'h':([45,],[69,]),'i':([45,],[70,]),'c':([46,],[75,]),'d':([46,],[76,]),'a':([47,],[80,]),'b':([47,],[81,]),'f':([49,],[86,]),'cte':([49,],[88,]),'right_par_cond':([61,],[94,]),'l':([64,],[98,]),'comma':([64,],[99,]),'q':([67,],[102,]),'right_par_fact':([85,],[108,]),'right_par_cycle':([112,],[115,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> program","S'",1,None,None,None),
+  ('empty -> <empty>','empty',0,'p_empty','PatitoParser.py',326),
+  ('program -> PROGRAM ID SEMICOLON r body END','program',6,'p_program','PatitoParser.py',331),
+  ('r -> empty','r',1,'p_r','PatitoParser.py',334),
+  ('r -> vars','r',1,'p_r','PatitoParser.py',335),
+  ('vars -> VAR n','vars',2,'p_vars','PatitoParser.py',339),
+  ('n -> o COLON type SEMICOLON q','n',5,'p_n','PatitoParser.py',342),
+  ('o -> ID p','o',2,'p_o','PatitoParser.py',345),
+  ('p -> COMMA o','p',2,'p_p','PatitoParser.py',360),
+  ('p -> empty','p',1,'p_p','PatitoParser.py',361),
+  ('q -> n','q',1,'p_q','PatitoParser.py',364),
+  ('q -> empty','q',1,'p_q','PatitoParser.py',365),
+  ('type -> INT','type',1,'p_type','PatitoParser.py',369),
+  ('type -> FLOAT','type',1,'p_type','PatitoParser.py',370),
+  ('body -> LEFT_BRACE m RIGHT_BRACE','body',3,'p_body','PatitoParser.py',385),
+  ('m -> statement m','m',2,'p_m','PatitoParser.py',388),
+  ('m -> empty','m',1,'p_m','PatitoParser.py',389),
+  ('statement -> assign','statement',1,'p_statement','PatitoParser.py',393),
+  ('statement -> condition','statement',1,'p_statement','PatitoParser.py',394),
+  ('statement -> cycle','statement',1,'p_statement','PatitoParser.py',395),
+  ('statement -> print','statement',1,'p_statement','PatitoParser.py',396),
+  ('assign -> id_assign equal_assign expresion SEMICOLON','assign',4,'p_assign','PatitoParser.py',400),
+  ('id_assign -> ID','id_assign',1,'p_id_assign','PatitoParser.py',404),
+  ('equal_assign -> EQUAL','equal_assign',1,'p_equal_assign','PatitoParser.py',418),
+  ('print -> COUT LEFT_PARENTHESIS j RIGHT_PARENTHESIS SEMICOLON','print',5,'p_print','PatitoParser.py',424),
+  ('j -> k l','j',2,'p_j','PatitoParser.py',440),
+  ('k -> expresion','k',1,'p_k','PatitoParser.py',443),
+  ('k -> CTE_STRING','k',1,'p_k','PatitoParser.py',444),
+  ('l -> comma j','l',2,'p_l','PatitoParser.py',461),
+  ('l -> empty','l',1,'p_l','PatitoParser.py',462),
+  ('comma -> COMMA','comma',1,'p_comma','PatitoParser.py',465),
+  ('cycle -> do body WHILE LEFT_PARENTHESIS expresion right_par_cycle SEMICOLON','cycle',7,'p_cycle','PatitoParser.py',482),
+  ('do -> DO','do',1,'p_do','PatitoParser.py',485),
+  ('right_par_cycle -> RIGHT_PARENTHESIS','right_par_cycle',1,'p_right_par_cycle','PatitoParser.py',490),
+  ('expresion -> exp h','expresion',2,'p_expresion','PatitoParser.py',496),
+  ('h -> i exp','h',2,'p_h','PatitoParser.py',499),
+  ('h -> empty','h',1,'p_h','PatitoParser.py',500),
+  ('i -> GREATER_THAN','i',1,'p_i','PatitoParser.py',503),
+  ('i -> LESS_THAN','i',1,'p_i','PatitoParser.py',504),
+  ('i -> DIFFERENT_THAN','i',1,'p_i','PatitoParser.py',505),
+  ('condition -> IF u g SEMICOLON','condition',4,'p_condition','PatitoParser.py',511),
+  ('u -> LEFT_PARENTHESIS expresion right_par_cond body','u',4,'p_u','PatitoParser.py',523),
+  ('right_par_cond -> RIGHT_PARENTHESIS','right_par_cond',1,'p_right_par_cond','PatitoParser.py',527),
+  ('v -> else body','v',2,'p_v','PatitoParser.py',532),
+  ('g -> elif u v','g',3,'p_g','PatitoParser.py',535),
+  ('g -> v','g',1,'p_g','PatitoParser.py',536),
+  ('g -> empty','g',1,'p_g','PatitoParser.py',537),
+  ('elif -> ELIF','elif',1,'p_elif','PatitoParser.py',540),
+  ('else -> ELSE','else',1,'p_else','PatitoParser.py',548),
+  ('factor -> left_par_fact expresion right_par_fact','factor',3,'p_factor','PatitoParser.py',557),
+  ('factor -> e f','factor',2,'p_factor','PatitoParser.py',558),
+  ('left_par_fact -> LEFT_PARENTHESIS','left_par_fact',1,'p_left_par_fact','PatitoParser.py',564),
+  ('right_par_fact -> RIGHT_PARENTHESIS','right_par_fact',1,'p_right_par_fact','PatitoParser.py',569),
+  ('e -> MINUS','e',1,'p_e','PatitoParser.py',575),
+  ('e -> PLUS','e',1,'p_e','PatitoParser.py',576),
+  ('e -> empty','e',1,'p_e','PatitoParser.py',577),
+  ('f -> ID','f',1,'p_f','PatitoParser.py',585),
+  ('f -> cte','f',1,'p_f','PatitoParser.py',586),
+  ('exp -> term c','exp',2,'p_exp','PatitoParser.py',606),
+  ('c -> d exp','c',2,'p_c','PatitoParser.py',612),
+  ('c -> empty','c',1,'p_c','PatitoParser.py',613),
+  ('d -> PLUS','d',1,'p_d','PatitoParser.py',616),
+  ('d -> MINUS','d',1,'p_d','PatitoParser.py',617),
+  ('term -> factor a','term',2,'p_term','PatitoParser.py',623),
+  ('a -> b term','a',2,'p_a','PatitoParser.py',629),
+  ('a -> empty','a',1,'p_a','PatitoParser.py',630),
+  ('b -> TIMES','b',1,'p_b','PatitoParser.py',633),
+  ('b -> DIVIDE','b',1,'p_b','PatitoParser.py',634),
+  ('cte -> CTE_INT','cte',1,'p_cte','PatitoParser.py',640),
+  ('cte -> CTE_FLOAT','cte',1,'p_cte','PatitoParser.py',641),
+]
@@ -0,0 +1,154 @@
+# ------------------------------------------------------------
+# PatitoProfiler.py
+#
+# Profile of a program in Patito Language: executions and time of every
+# quad, operation, line of the source and loop
+# ------------------------------------------------------------
+
+import argparse
+import contextlib
+import io
+import json
+from tabulate import tabulate
+from PatitoOptimizer import PatitoOptimizer
+from PatitoOutput import PatitoOutput
+from PatitoParser import JUMPS
+from PatitoProgram import PatitoCompileError
+from PatitoVirtualMachine import PatitoVirtualMachine, read_file
+
+class PatitoProfile(object):
+
+    def __init__(self, quadruples, lines, counts, times, source = ''):
+        self.quadruples = quadruples
+        # Line of the source of every quad
+        self.lines = lines
+        # Executions and seconds of every quad
+        self.counts = counts
+        self.times = times
+        self.source_lines = source.split('\n')
+
+    # Seconds spent in all the quads
+    def total_time(self):
+        return sum(self.times)
+
+    # Text of a line of the source
+    def source_line(self, line):
+        if line is None or not 0 < line <= len(self.source_lines):
+            return ''
+        return self.source_lines[line - 1].strip()
+
+    # Executions and time of every quad
+    def by_quad(self):
+        rows = []
+        for program_counter, quad in enumerate(self.quadruples):
+            rows.append({
+                'quad': program_counter,
+                'line': self.lines[program_counter],
+                'operation': quad[0],
+                'count': self.counts[program_counter],
+                'time': self.times[program_counter],
+            })
+        return rows
+
+    # Executions and time of every operation
+    def by_operation(self):
+        operations = {}
+        for program_counter, quad in enumerate(self.quadruples):
+            row = operations.setdefault(quad[0], {'operation': quad[0], 'count': 0, 'time': 0.0})
+            row['count'] += self.counts[program_counter]
+            row['time'] += self.times[program_counter]
+        return list(operations.values())
+
+    # Executions and time of every line of the source
+    def by_line(self):
+        lines = {}
+        for program_counter, line in enumerate(self.lines):
+            row = lines.setdefault(line, {'line': line, 'source': self.source_line(line), 'quads': 0, 'count': 0, 'time': 0.0})
+            row['quads'] += 1
+            row['count'] += self.counts[program_counter]
+            row['time'] += self.times[program_counter]
+        return list(lines.values())
+
+    # Loops of the program (a jump back to a previous quad) with the time of their quads.
+    # The iterations are the executions of the first quad of the loop.
+    def by_loop(self):
+        loops = []
+        for program_counter, (operation, operand1, operand2, result) in enumerate(self.quadruples):
+            if operation in JUMPS and result <= program_counter:
+                lines = [line for line in self.lines[result:program_counter + 1] if line is not None]
+                loops.append({
+                    'start': result,
+                    'end': program_counter,
+                    'lines': [min(lines), max(lines)] if lines else None,
+                    'iterations': self.counts[result],
+                    'count': sum(self.counts[result:program_counter + 1]),
+                    'time': sum(self.times[result:program_counter + 1]),
+                })
+        return loops
+
+    # Print the tables of the profile sorted by time, with the top rows of every one
+    def print_report(self, top = 10):
+        total = self.total_time() or 1.0
+
+        def rows(entries, columns):
+            entries = sorted(entries, key=lambda entry: entry['time'], reverse=True)[:top]
+            return [[entry[column] for column in columns] + ['%.1f' % (entry['time'] * 1e6), '%.1f%%' % (entry['time'] / total * 100)] for entry in entries]
+
+        print('QUADS')
+        print(tabulate(rows(self.by_quad(), ['quad', 'line', 'operation', 'count']), headers=['quad', 'line', 'operation', 'count', 'time (us)', 'time'], tablefmt='grid'))
+        print('\n')
+        print('OPERATIONS')
+        print(tabulate(rows(self.by_operation(), ['operation', 'count']), headers=['operation', 'count', 'time (us)', 'time'], tablefmt='grid'))
+        print('\n')
+        print('LINES')
+        print(tabulate(rows(self.by_line(), ['line', 'source', 'quads', 'count']), headers=['line', 'source', 'quads', 'count', 'time (us)', 'time'], tablefmt='grid'))
+        print('\n')
+        print('LOOPS')
+        print(tabulate(rows(self.by_loop(), ['start', 'end', 'lines', 'iterations', 'count']), headers=['start', 'end', 'lines', 'iterations', 'count', 'time (us)', 'time'], tablefmt='grid'))
+        print('\n')
+
+    # Profile as a dictionary that can be saved as JSON
+    def as_dict(self):
+        return {
+            'total_time': self.total_time(),
+            'executed_quads': sum(self.counts),
+            'quads': self.by_quad(),
+            'operations': self.by_operation(),
+            'lines': self.by_line(),
+            'loops': self.by_loop(),
+        }
+
+    # Save the profile in a JSON file
+    def dump(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.as_dict(), file, indent=2)
+
+# Compile and run a program measuring every quad. The output of the program is discarded.
+# Raises PatitoCompileError if the program has errors.
+def profile(source, optimizations = (), memory_model = 'list', limits = None):
+    patitoVM = PatitoVirtualMachine(optimizations=optimizations, memory_model=memory_model, output=PatitoOutput(), limits=limits)
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaded = patitoVM.load(source)
+    if not loaded:
+        raise PatitoCompileError(patitoVM.error)
+    patitoVM.create_memory_vars()
+    patitoVM.run_engine('profile')
+    return PatitoProfile(patitoVM.quadruples, patitoVM.quad_lines, patitoVM.quad_counts, patitoVM.quad_times, source)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Profile the execution of a Patito program')
+    arg_parser.add_argument('program')
+    arg_parser.add_argument('--optimize', action='append', choices=PatitoOptimizer.passes, default=[], help='optimization pass to apply (can be repeated)')
+    arg_parser.add_argument('--top', type=int, default=10, help='number of rows of every table')
+    arg_parser.add_argument('--json', metavar='FILE', help='save the profile in a JSON file')
+    args = arg_parser.parse_args()
+
+    try:
+        result = profile(read_file(args.program), args.optimize)
+    except PatitoCompileError as e:
+        print('Error in Compiler\n', e.error)
+    else:
+        result.print_report(args.top)
+        if args.json:
+            result.dump(args.json)
@@ -0,0 +1,210 @@
+# ------------------------------------------------------------
+# PatitoProgram.py
+#
+# Compiled program in Patito Language that can be run many times
+# ------------------------------------------------------------
+
+import argparse
+import time
+from PatitoLimits import PatitoLimitError
+from PatitoOutput import buffer_output
+from PatitoTimings import measure
+from PatitoVirtualMachine import PatitoVirtualMachine, read_file
+
+class PatitoCompileError(Exception):
+
+    def __init__(self, error):
+        Exception.__init__(self, error)
+        # Message of the compiler
+        self.error = error
+
+class RunResult(object):
+
+    def __init__(self, output, variables, executed_quads, elapsed, error = None):
+        # Text printed by the program (None if the output does not capture it)
+        self.output = output
+        # Final value of every variable by name
+        self.variables = variables
+        self.executed_quads = executed_quads
+        # Seconds spent executing the quads
+        self.elapsed = elapsed
+        # PatitoLimitError if the run was stopped by a limit, or the exception of the
+        # error that stopped it (like a division by zero). The output and the variables
+        # are the ones of that moment.
+        self.error = error
+
+    def __repr__(self):
+        return 'RunResult(variables=%r, executed_quads=%d, elapsed=%.6f, error=%r)' % (self.variables, self.executed_quads, self.elapsed, self.error)
+
+class Program(object):
+
+    def __init__(self, quadruples, code, memory_const, count_memory, symbols, memory_model = 'list', optimization_stats = None):
+        # Quads of the compiler and the same quads linked to indexes of the memory
+        self.quadruples = tuple(quadruples)
+        self.code = tuple(code)
+        self.memory_const = tuple(memory_const)
+        self.count_memory = dict(count_memory)
+        # Memory index of every variable
+        self.symbols = symbols
+        self.memory_model = memory_model
+        self.optimization_stats = optimization_stats or {}
+        # Encoded code for the bytecode engine, created when it's used
+        self.bytecode = None
+        # Program translated to Python for the python engine, created when it's used
+        self.transpiled = None
+        # Functions of the basic blocks for the blocks engine, created when they're used
+        self.blocks = None
+
+        # Memory with the constants and a space for every variable and temporal.
+        # Every run starts from a copy of it.
+        patitoVM = PatitoVirtualMachine(memory_model=memory_model)
+        patitoVM.memory_const = list(self.memory_const)
+        patitoVM.count_memory = self.count_memory
+        self.template = patitoVM.create_memory_vars()
+
+    # Number of quads of the program
+    def __len__(self):
+        return len(self.code)
+
+    # Create the memory of a run
+    def create_memory(self):
+        return self.template.copy()
+
+    # Prepare a run that is executed by steps with ProgramState.step
+    def start(self, output = None, limits = None):
+        return ProgramState(self, output, limits)
+
+    # Run the program with an engine. The output is captured unless another one is given.
+    # If a limit or an error stops the run, the result has the error and the state at that moment.
+    def run(self, engine = 'loop', output = None, limits = None, timings = None):
+        if output is None:
+            output = buffer_output()
+        patitoVM = PatitoVirtualMachine(memory_model=self.memory_model, output=output, limits=limits, timings=timings)
+        patitoVM.code = self.code
+        patitoVM.memory_const = self.memory_const
+        patitoVM.count_memory = self.count_memory
+        patitoVM.bytecode = self.bytecode
+        patitoVM.transpiled = self.transpiled
+        patitoVM.blocks = self.blocks
+        with measure(timings, 'create memory'):
+            patitoVM.memory = self.create_memory()
+        patitoVM.executed_quads = 0
+
+        error = None
+        start = time.perf_counter()
+        try:
+            captured = patitoVM.run_engine(engine)
+        except Exception as e:
+            # Limits and errors of the program are part of the result
+            error = e
+            captured = output.getvalue()
+        finally:
+            # Keep the encoded and the translated code for the next runs, also if the program fails
+            self.bytecode = patitoVM.bytecode
+            self.transpiled = patitoVM.transpiled
+            self.blocks = patitoVM.blocks
+        elapsed = time.perf_counter() - start
+
+        memory = patitoVM.memory
+        variables = {name: memory[index] for name, index in self.symbols.items()}
+        return RunResult(captured, variables, patitoVM.executed_quads, elapsed, error)
+
+class ProgramState(object):
+
+    def __init__(self, program, output = None, limits = None):
+        self.program = program
+        self.output = buffer_output() if output is None else output
+        # Virtual Machine with its own memory, the program is executed with threaded code
+        # because every handler returns where to continue
+        self.patitoVM = PatitoVirtualMachine(memory_model=program.memory_model, output=self.output)
+        self.patitoVM.code = program.code
+        self.patitoVM.memory = program.create_memory()
+        self.patitoVM.sink = self.output
+        self.handlers = self.patitoVM.thread()
+        self.program_counter = 0
+        self.executed_quads = 0
+        # Seconds spent executing quads, without the time the program was paused
+        self.elapsed = 0.0
+        self.finished = False
+        self.error = None
+        # Limits of the whole run, checked after every slice
+        self.limits = limits
+        self.start_time = time.perf_counter()
+        self.deadline = None
+        if limits is not None:
+            self.deadline = limits.deadline(self.start_time)
+            try:
+                limits.check_memory(self.patitoVM.memory)
+            except PatitoLimitError as e:
+                self.error = e
+                self.finished = True
+
+    # Execute at most quads quads and pause. Returns True when the program finished.
+    # A program stopped by a limit is finished and keeps the error.
+    def step(self, quads):
+        handlers = self.handlers
+        size = len(handlers)
+        program_counter = self.program_counter
+        executed = 0
+
+        start = time.perf_counter()
+        try:
+            while executed < quads and program_counter < size:
+                executed += 1
+                program_counter = handlers[program_counter]()
+        except Exception:
+            self.finished = True
+            self.output.flush()
+            raise
+        finally:
+            self.program_counter = program_counter
+            self.executed_quads += executed
+            self.elapsed += time.perf_counter() - start
+
+        if program_counter >= size:
+            self.finished = True
+            self.output.flush()
+        elif self.limits is not None:
+            try:
+                self.limits.check(program_counter, self.executed_quads, self.start_time, self.deadline)
+            except PatitoLimitError as e:
+                self.error = e
+                self.finished = True
+                self.output.flush()
+        return self.finished
+
+    # Result of the program, complete when the program finished
+    def result(self):
+        memory = self.patitoVM.memory
+        variables = {name: memory[index] for name, index in self.program.symbols.items()}
+        return RunResult(self.output.getvalue(), variables, self.executed_quads, self.elapsed, self.error)
+
+# Compile a program. Raises PatitoCompileError if the program has errors.
+# The phases of the compiler are measured if timings (PatitoTimings) is given.
+def compile(source, optimizations = (), cache = None, memory_model = 'list', timings = None):
+    patitoVM = PatitoVirtualMachine(cache, optimizations, memory_model, timings=timings)
+    if not patitoVM.load(source):
+        raise PatitoCompileError(patitoVM.error)
+
+    symbols = {}
+    for name, variable in patitoVM.symbol_table.items():
+        symbols[name] = patitoVM.find_dir_in_memory(variable['memory_dir'])
+    return Program(patitoVM.quadruples, patitoVM.code, patitoVM.memory_const, patitoVM.count_memory, symbols, memory_model, patitoVM.optimization_stats)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Compile a Patito program once and run it')
+    arg_parser.add_argument('program')
+    arg_parser.add_argument('--engine', choices=PatitoVirtualMachine.engines, default='loop', help='engine used to execute the quads')
+    arg_parser.add_argument('--runs', type=int, default=1, help='number of times the program is run')
+    args = arg_parser.parse_args()
+
+    try:
+        program = compile(read_file(args.program))
+    except PatitoCompileError as e:
+        print('Error in Compiler\n', e.error)
+    else:
+        for _ in range(args.runs):
+            result = program.run(args.engine)
+        print(result.output, end='')
+        print(result)
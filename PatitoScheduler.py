@@ -0,0 +1,82 @@
+# ------------------------------------------------------------
+# PatitoScheduler.py
+#
+# Run many programs in Patito Language in one event loop, every program
+# executes a slice of quads and lets the others continue
+# ------------------------------------------------------------
+
+import argparse
+import asyncio
+import time
+from tabulate import tabulate
+from PatitoGenerator import generate_program
+from PatitoProgram import compile
+
+class PatitoScheduler(object):
+
+    def __init__(self, slice_quads = 1000, limits = None):
+        # Quads executed by a program before it pauses, None to run programs to the end
+        self.slice_quads = slice_quads
+        # Limits of every program (PatitoLimits), checked after every slice
+        self.limits = limits
+        self.slices = 0
+
+    # Run a compiled program. Between slices the other tasks of the loop are attended;
+    # the loop resumes ready tasks in order, so programs take turns.
+    async def run(self, program, output = None):
+        state = program.start(output, self.limits)
+        quads = self.slice_quads if self.slice_quads is not None else float('inf')
+        while not state.finished:
+            self.slices += 1
+            if state.step(quads):
+                break
+            await asyncio.sleep(0)
+        return state.result()
+
+    # Run many programs at the same time. The results keep the order of the programs,
+    # a program that fails has its exception in place of the result.
+    async def run_all(self, programs):
+        return await asyncio.gather(*[self.run(program) for program in programs], return_exceptions=True)
+
+# Time when every program finishes, measured from the start of the group
+async def finish_times(scheduler, programs):
+    start = time.perf_counter()
+    times = [None] * len(programs)
+
+    async def run(position, program):
+        await scheduler.run(program)
+        times[position] = time.perf_counter() - start
+
+    await asyncio.gather(*[run(position, program) for position, program in enumerate(programs)])
+    return times
+
+# Compare the latency of short programs that share the loop with a long one. The programs
+# are the generated ones of the benchmarks, with a loop of trip iterations.
+def compare_slices(slices = (None, 10000, 1000, 100), trip = 20000, short = 20):
+    long_program = compile(generate_program(trip))
+    short_program = compile(generate_program(10))
+    # The long program arrives first
+    programs = [long_program] + [short_program] * short
+
+    table = []
+    for slice_quads in slices:
+        times = asyncio.run(finish_times(PatitoScheduler(slice_quads), programs))
+        short_times = sorted(times[1:])
+        table.append([
+            'none' if slice_quads is None else slice_quads,
+            '%.2f' % (short_times[len(short_times) // 2] * 1000),
+            '%.2f' % (short_times[-1] * 1000),
+            '%.2f' % (times[0] * 1000),
+        ])
+
+    print(tabulate(table, headers=['slice (quads)', 'short p50 (ms)', 'short max (ms)', 'long (ms)'], tablefmt='grid'))
+    return table
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Compare the latency of short programs running with a long one')
+    arg_parser.add_argument('--trip', type=int, default=20000, help='iterations of the loop of the long program')
+    arg_parser.add_argument('--short', type=int, default=20, help='number of short programs')
+    args = arg_parser.parse_args()
+
+    compare_slices(trip=args.trip, short=args.short)
@@ -0,0 +1,308 @@
+# ------------------------------------------------------------
+# PatitoServer.py
+#
+# Long-lived server that compiles and runs programs in Patito Language
+# received over a Unix socket, and the client to send them
+#
+# Protocol: one JSON object per line in both directions.
+#   request   {"source": "..."} or {"key": "..."} to run a program that was
+#             already sent, with optional "engine" and "optimize" (list of
+#             passes), and optional limits "max_quads" and "timeout". The
+#             limits of the server always apply, a request can only lower them.
+#             {"command": "stats"} returns the counters.
+#   response  {"ok": true, "key", "output", "variables", "executed_quads",
+#             "elapsed", "cached"} or {"ok": false, "error"}. A run stopped
+#             by an error also has the output, variables and quads of that
+#             moment, and "limit" with the state if it was a limit.
+# ------------------------------------------------------------
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from PatitoCache import PatitoCache
+from PatitoLimits import PatitoLimitError, PatitoLimits
+from PatitoOptimizer import PatitoOptimizer
+from PatitoParser import COMPILER_VERSION, get_parser
+from PatitoProgram import PatitoCompileError, compile
+from PatitoVirtualMachine import PatitoVirtualMachine, read_file
+
+SOCKET_PATH = '/tmp/patito.sock'
+
+# Biggest line accepted by the server (a request with the source of a program)
+LINE_LIMIT = 16 * 1024 * 1024
+
+# Limits of every run in the server, so a program can't keep a worker forever
+MAX_QUADS = 100000000
+TIMEOUT = 10.0
+
+# Threads that run programs at the same time
+WORKERS = 4
+
+class PatitoServer(object):
+
+    def __init__(self, path = SOCKET_PATH, max_programs = 256, cache = None, max_latencies = 10000, workers = WORKERS, limits = None):
+        self.path = path
+        # Compiled programs by key, the least recently used is removed first
+        self.programs = OrderedDict()
+        self.max_programs = max_programs
+        # Cache in disk (PatitoCache) used when a program is not in memory
+        self.cache = cache
+        # Latency of the last requests in seconds
+        self.latencies = deque(maxlen=max_latencies)
+        self.requests = 0
+        self.errors = 0
+        self.compiled = 0
+        # Limits of every run (PatitoLimits), the ones of a request can only be lower
+        self.limits = PatitoLimits(MAX_QUADS, TIMEOUT) if limits is None else limits
+        # Programs run outside of the event loop, which keeps attending the clients.
+        # The parser is shared, so only one program is compiled at a time.
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.compile_lock = threading.Lock()
+
+    # Key of a compiled program: hash of the compiler version, the passes and the source
+    def key(self, source, optimizations):
+        content = COMPILER_VERSION + '\0' + ','.join(optimizations) + '\0' + source
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    # Get a compiled program by key, compiling the source if it's new
+    def get_program(self, key, source, optimizations):
+        with self.compile_lock:
+            program = self.programs.get(key)
+            if program is not None:
+                self.programs.move_to_end(key)
+                return program, True
+            if source is None:
+                raise KeyError('Program ' + key + ' is not in the server')
+
+            # The compiler prints its errors, they are sent in the response instead
+            with contextlib.redirect_stdout(io.StringIO()):
+                program = compile(source, optimizations, self.cache)
+            self.compiled += 1
+            self.programs[key] = program
+            if len(self.programs) > self.max_programs:
+                self.programs.popitem(last=False)
+            return program, False
+
+    # Limits of the run of a request: the ones of the server, lowered by the request
+    def request_limits(self, request):
+        return PatitoLimits(lowest(self.limits.max_quads, request.get('max_quads')),
+                            lowest(self.limits.timeout, request.get('timeout')),
+                            self.limits.max_memory)
+
+    # Compile (if needed) and run the program of a request
+    def run_request(self, request):
+        optimizations = tuple(request.get('optimize', ()))
+        source = request.get('source')
+        key = request.get('key')
+        if key is None:
+            if source is None:
+                raise ValueError('Request needs a source or a key')
+            key = self.key(source, optimizations)
+
+        program, cached = self.get_program(key, source, optimizations)
+        result = program.run(request.get('engine', 'loop'), limits=self.request_limits(request))
+        response = {
+            'ok': True,
+            'key': key,
+            'cached': cached,
+            'output': result.output,
+            'variables': result.variables,
+            'executed_quads': result.executed_quads,
+            'elapsed': result.elapsed,
+        }
+        if result.error is not None:
+            response['ok'] = False
+            response['error'] = 'Error in Virtual Machine ' + str(result.error)
+            if isinstance(result.error, PatitoLimitError):
+                response['limit'] = result.error.as_dict()
+        return response
+
+    # Answer a request. Errors are sent to the client, they never stop the server.
+    async def answer(self, request):
+        if request.get('command') == 'stats':
+            return dict(self.stats(), ok=True)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, self.run_request, request)
+        except PatitoCompileError as e:
+            return {'ok': False, 'error': 'Error in Compiler\n' + str(e.error)}
+        except KeyError as e:
+            return {'ok': False, 'error': e.args[0]}
+        except Exception as e:
+            return {'ok': False, 'error': 'Error in Virtual Machine ' + str(e)}
+
+    # Attend a client, it can send many requests in the same connection
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                too_long = False
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # The line is longer than LINE_LIMIT, the rest of the connection can't be read
+                    too_long = True
+                else:
+                    if not line:
+                        break
+                start = time.perf_counter()
+                if too_long:
+                    response = {'ok': False, 'error': 'Invalid request: line too long'}
+                else:
+                    try:
+                        request = json.loads(line)
+                        if not isinstance(request, dict):
+                            raise ValueError('expected a JSON object')
+                    except ValueError as e:
+                        response = {'ok': False, 'error': 'Invalid request: ' + str(e)}
+                    else:
+                        response = await self.answer(request)
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+
+                self.requests += 1
+                if not response['ok']:
+                    self.errors += 1
+                self.latencies.append(time.perf_counter() - start)
+                if too_long:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # Counters of the server with the percentiles of the latency in milliseconds
+    def stats(self):
+        latencies = sorted(self.latencies)
+        stats = {
+            'requests': self.requests,
+            'errors': self.errors,
+            'compiled': self.compiled,
+            'programs': len(self.programs),
+        }
+        for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0)):
+            stats[name + '_ms'] = percentile(latencies, fraction) * 1000
+        return stats
+
+    # Listen on the socket until the task is cancelled
+    async def serve(self):
+        # Build the parser before the first client arrives
+        get_parser()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        server = await asyncio.start_unix_server(self.handle_client, path=self.path, limit=LINE_LIMIT)
+        print('Patito server listening on ' + self.path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(wait=False)
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+# Lowest of two limits, None is no limit
+def lowest(limit, other):
+    if limit is None:
+        return other
+    if other is None:
+        return limit
+    return min(limit, other)
+
+# Value at a fraction of a sorted list (nearest rank), 0 if the list is empty
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    index = max(0, int(round(fraction * len(values))) - 1)
+    return values[min(index, len(values) - 1)]
+
+class PatitoClient(object):
+
+    def __init__(self, path = SOCKET_PATH):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.file = self.socket.makefile('rwb')
+
+    # Send a request and wait for its response
+    def request(self, message):
+        self.file.write(json.dumps(message).encode('utf-8') + b'\n')
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError('Server closed the connection')
+        return json.loads(line)
+
+    # Run the source of a program. max_quads and timeout can lower the limits of the server.
+    def run(self, source, engine = 'loop', optimizations = (), max_quads = None, timeout = None):
+        return self.request({'source': source, 'engine': engine, 'optimize': list(optimizations), 'max_quads': max_quads, 'timeout': timeout})
+
+    # Run a program that the server already compiled
+    def run_key(self, key, engine = 'loop', max_quads = None, timeout = None):
+        return self.request({'key': key, 'engine': engine, 'max_quads': max_quads, 'timeout': timeout})
+
+    def stats(self):
+        return self.request({'command': 'stats'})
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Run Patito programs in a long-lived server')
+    arg_parser.add_argument('--socket', default=SOCKET_PATH, help='path of the Unix socket')
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+    serve_parser = subparsers.add_parser('serve', help='start the server')
+    serve_parser.add_argument('--programs', type=int, default=256, help='number of compiled programs kept in memory')
+    serve_parser.add_argument('--cache', metavar='DIR', help='directory to cache compiled programs in disk')
+    serve_parser.add_argument('--workers', type=int, default=WORKERS, help='number of programs run at the same time')
+    serve_parser.add_argument('--max-quads', type=int, default=MAX_QUADS, help='quads a run can execute')
+    serve_parser.add_argument('--timeout', type=float, default=TIMEOUT, help='seconds a run can take')
+    run_parser = subparsers.add_parser('run', help='run a program in the server')
+    run_parser.add_argument('program', nargs='?', help='file with the program')
+    run_parser.add_argument('--key', help='key of a program already sent to the server')
+    run_parser.add_argument('--engine', choices=PatitoVirtualMachine.engines, default='loop', help='engine used to execute the quads')
+    run_parser.add_argument('--optimize', action='append', choices=PatitoOptimizer.passes, default=[], help='optimization pass to apply (can be repeated)')
+    run_parser.add_argument('--repeat', type=int, default=1, help='number of times the program is sent')
+    run_parser.add_argument('--max-quads', type=int, help='quads the run can execute (lower than the limit of the server)')
+    run_parser.add_argument('--timeout', type=float, help='seconds the run can take (lower than the limit of the server)')
+    subparsers.add_parser('stats', help='print the counters and latency of the server')
+    args = arg_parser.parse_args()
+
+    if args.command == 'serve':
+        cache = PatitoCache(args.cache) if args.cache else None
+        patitoServer = PatitoServer(args.socket, args.programs, cache, workers=args.workers, limits=PatitoLimits(args.max_quads, args.timeout))
+        try:
+            asyncio.run(patitoServer.serve())
+        except KeyboardInterrupt:
+            print(json.dumps(patitoServer.stats()))
+    else:
+        client = PatitoClient(args.socket)
+        if args.command == 'stats':
+            print(json.dumps(client.stats(), indent=2))
+        else:
+            if args.key is None and args.program is None:
+                arg_parser.error('run needs a program or --key')
+            for _ in range(args.repeat):
+                if args.key is not None:
+                    response = client.run_key(args.key, args.engine, args.max_quads, args.timeout)
+                else:
+                    response = client.run(read_file(args.program), args.engine, args.optimize, args.max_quads, args.timeout)
+            if response['ok']:
+                sys.stdout.write(response['output'])
+                print('key: ' + response['key'])
+                print('variables: ' + json.dumps(response['variables']))
+                print('quads: %d, elapsed: %.6f s' % (response['executed_quads'], response['elapsed']))
+            else:
+                # What the program printed before the error
+                sys.stdout.write(response.get('output', ''))
+                print(response['error'])
+        client.close()
@@ -0,0 +1,78 @@
+# ------------------------------------------------------------
+# PatitoTimings.py
+#
+# Wall time and peak memory of every phase of the compiler and the
+# Virtual Machine
+# ------------------------------------------------------------
+
+import contextlib
+import time
+import tracemalloc
+from tabulate import tabulate
+
+class PatitoTimings(object):
+
+    def __init__(self, memory = True):
+        # Measures of every phase in the order they ran the first time
+        self.phases = {}
+        # Measure the memory with tracemalloc (it makes the phases slower)
+        self.memory = memory
+        self.started_tracing = False
+
+    # Start tracing the memory if it's not traced yet
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    # Stop tracing the memory if it was started by start()
+    def stop(self):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    # Measure a phase. Phases should not be nested because the peak of memory is reset
+    # when a phase starts. A phase that runs many times adds its time, and keeps its biggest peak.
+    @contextlib.contextmanager
+    def phase(self, name):
+        tracing = self.memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = None
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1] - start_memory
+            measure = self.phases.setdefault(name, {'phase': name, 'calls': 0, 'time': 0.0, 'peak_memory': None})
+            measure['calls'] += 1
+            measure['time'] += elapsed
+            if peak is not None and (measure['peak_memory'] is None or peak > measure['peak_memory']):
+                measure['peak_memory'] = peak
+
+    # Remove the measures
+    def reset(self):
+        self.phases = {}
+
+    # Measures as a list of dictionaries
+    def as_dict(self):
+        return [dict(measure) for measure in self.phases.values()]
+
+    # Print a table with the measures
+    def print_report(self):
+        tabla = []
+        for measure in self.phases.values():
+            peak = measure['peak_memory']
+            tabla.append([measure['phase'], measure['calls'], '%.3f' % (measure['time'] * 1000), '-' if peak is None else '%.1f' % (peak / 1024)])
+        print('TIMINGS')
+        print(tabulate(tabla, headers=['phase', 'calls', 'time (ms)', 'peak (KiB)'], tablefmt='grid'))
+        print('\n')
+
+# Measure a phase if there are timings, do nothing otherwise
+def measure(timings, name):
+    if timings is None:
+        return contextlib.nullcontext()
+    return timings.phase(name)
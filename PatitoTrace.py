@@ -0,0 +1,275 @@
+# ------------------------------------------------------------
+# PatitoTrace.py
+#
+# Binary trace of the quads executed by the Virtual Machine and the
+# tools to analyze it
+#
+# Layout (little endian):
+#   header   magic, version, size of a record, capacity (records) and
+#            number of records written (it can be bigger than the capacity)
+#   records  ring of capacity records of fixed width: program counter
+#            (uint32), opcode (uint8), kind of value (uint8), index of the
+#            result in memory (int32; the target quad for jumps and -1 for
+#            prints) and value (int64 or float64). Jumps store if they were
+#            taken as a bool.
+# ------------------------------------------------------------
+
+import argparse
+import contextlib
+import io
+import mmap
+import os
+import struct
+from tabulate import tabulate
+from PatitoBytecode import OPCODES, OPERATIONS
+from PatitoOptimizer import PatitoOptimizer
+from PatitoOutput import PatitoOutput
+from PatitoProgram import PatitoCompileError
+from PatitoVirtualMachine import PatitoVirtualMachine, read_file
+
+MAGIC = b'PTTR'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHHQQ')
+RECORD = struct.Struct('<IBBxxiq')
+FLOAT = struct.Struct('<d')
+INTEGER = struct.Struct('<q')
+
+# Kinds of the value of a record
+NO_VALUE = 0
+INT_VALUE = 1
+FLOAT_VALUE = 2
+BOOL_VALUE = 3
+
+# Opcodes of the jumps that depend on a condition
+CONDITIONAL_JUMPS = frozenset(OPCODES[operation] for operation in ('GoToV', 'GoToF', 'GoToV>', 'GoToV<', 'GoToV!=', 'GoToF>', 'GoToF<', 'GoToF!='))
+
+# Opcodes of every jump
+JUMP_OPCODES = CONDITIONAL_JUMPS | {OPCODES['GoTo']}
+
+class TraceWriter(object):
+
+    def __init__(self, path, capacity = 1 << 20):
+        if capacity < 1:
+            raise ValueError('Capacity of the trace must be at least 1 record')
+        self.path = path
+        # Number of records kept, the oldest ones are overwritten
+        self.capacity = capacity
+        # Number of records written
+        self.count = 0
+        size = HEADER.size + capacity * RECORD.size
+        with open(path, 'wb') as file:
+            file.truncate(size)
+        self.file = open(path, 'r+b')
+        self.buffer = mmap.mmap(self.file.fileno(), size)
+        self.write_header()
+
+    def write_header(self):
+        HEADER.pack_into(self.buffer, 0, MAGIC, VERSION, RECORD.size, self.capacity, self.count)
+
+    # Add a record. The value is stored if it's a bool, an int of 64 bits or a float.
+    def append(self, program_counter, opcode, result, value = None):
+        if value is None or isinstance(value, str):
+            kind, raw = NO_VALUE, 0
+        elif isinstance(value, bool):
+            kind, raw = BOOL_VALUE, int(value)
+        elif isinstance(value, float):
+            kind, raw = FLOAT_VALUE, INTEGER.unpack(FLOAT.pack(value))[0]
+        elif -(1 << 63) <= value < (1 << 63):
+            kind, raw = INT_VALUE, value
+        else:
+            kind, raw = NO_VALUE, 0
+        offset = HEADER.size + (self.count % self.capacity) * RECORD.size
+        RECORD.pack_into(self.buffer, offset, program_counter, opcode, kind, result, raw)
+        self.count += 1
+
+    # Write the header and release the file. If the ring was not filled the file
+    # is cut to the records that were written.
+    def close(self):
+        if self.buffer is None:
+            return
+        if self.count < self.capacity:
+            self.capacity = self.count
+        self.write_header()
+        self.buffer.flush()
+        self.buffer.close()
+        self.file.truncate(HEADER.size + self.capacity * RECORD.size)
+        self.file.close()
+        self.buffer = None
+
+class TraceReader(object):
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, self.capacity, self.count = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError('File is not a Patito trace')
+        if version != VERSION or record_size != RECORD.size:
+            raise ValueError('Trace version ' + str(version) + ' is not supported')
+
+    # Number of records in the file
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    # Records from the oldest to the newest as tuples (program counter, opcode, kind,
+    # result, value). They are read from the mapped file one at a time.
+    def records(self):
+        view = memoryview(self.buffer)[HEADER.size:HEADER.size + len(self) * RECORD.size]
+        first = self.count % self.capacity if self.count > self.capacity else 0
+        for part in (view[first * RECORD.size:], view[:first * RECORD.size]):
+            for program_counter, opcode, kind, result, raw in RECORD.iter_unpack(part):
+                if kind == FLOAT_VALUE:
+                    value = FLOAT.unpack(INTEGER.pack(raw))[0]
+                elif kind == BOOL_VALUE:
+                    value = bool(raw)
+                elif kind == INT_VALUE:
+                    value = raw
+                else:
+                    value = None
+                yield program_counter, opcode, kind, result, value
+            part.release()
+        view.release()
+
+    # Executions and taken jumps of every conditional jump
+    def branch_ratios(self):
+        branches = {}
+        for program_counter, opcode, kind, result, taken in self.records():
+            if opcode in CONDITIONAL_JUMPS:
+                branch = branches.setdefault(program_counter, {'quad': program_counter, 'operation': OPERATIONS[opcode], 'executed': 0, 'taken': 0})
+                branch['executed'] += 1
+                if taken:
+                    branch['taken'] += 1
+        for branch in branches.values():
+            branch['ratio'] = branch['taken'] / branch['executed']
+        return sorted(branches.values(), key=lambda branch: branch['quad'])
+
+    # Trip counts of every loop. A loop is a jump back to a previous quad, a run
+    # of the loop ends when the jump is not taken.
+    def trip_counts(self):
+        loops = {}
+        for program_counter, opcode, kind, target, taken in self.records():
+            if opcode not in JUMP_OPCODES or target > program_counter:
+                continue
+            loop = loops.get(program_counter)
+            if loop is None:
+                loop = loops[program_counter] = {'start': target, 'end': program_counter, 'runs': 0, 'trips': 0, 'min': None, 'max': None, 'current': 1}
+            if taken is not False:
+                loop['current'] += 1
+                continue
+            trips = loop['current']
+            loop['runs'] += 1
+            loop['trips'] += trips
+            loop['min'] = trips if loop['min'] is None else min(loop['min'], trips)
+            loop['max'] = trips if loop['max'] is None else max(loop['max'], trips)
+            loop['current'] = 1
+
+        rows = []
+        for loop in loops.values():
+            rows.append({
+                'start': loop['start'],
+                'end': loop['end'],
+                'runs': loop['runs'],
+                'min': loop['min'],
+                'mean': loop['trips'] / loop['runs'] if loop['runs'] else None,
+                'max': loop['max'],
+                # Iterations of a run that did not end in the trace
+                'unfinished': loop['current'] - 1,
+            })
+        return sorted(rows, key=lambda loop: loop['start'])
+
+    # Most common paths. A path is the sequence of conditional jumps (quad and if it was
+    # taken) inside an iteration of a loop, so every iteration that follows the same
+    # branches is the same path.
+    def hot_paths(self, top = 10):
+        paths = {}
+        decisions = []
+        for program_counter, opcode, kind, target, taken in self.records():
+            if opcode not in JUMP_OPCODES:
+                continue
+            if opcode in CONDITIONAL_JUMPS:
+                decisions.append((program_counter, bool(taken)))
+            if target <= program_counter:
+                # An iteration of the loop ends, with the jump back taken or not
+                path = tuple(decision for decision in decisions if target <= decision[0] <= program_counter)
+                key = (target, program_counter, path)
+                paths[key] = paths.get(key, 0) + 1
+                decisions = []
+
+        total = sum(paths.values()) or 1
+        rows = []
+        for (start, end, decisions), count in sorted(paths.items(), key=lambda item: item[1], reverse=True)[:top]:
+            rows.append({
+                'start': start,
+                'end': end,
+                'branches': ' '.join(str(quad) + ('T' if taken else 'F') for quad, taken in decisions),
+                'count': count,
+                'share': count / total,
+            })
+        return rows
+
+    def close(self):
+        self.buffer.close()
+
+# Compile and run a program writing the trace in a file. The output of the program is discarded.
+# Raises PatitoCompileError if the program has errors.
+def record(source, path, capacity = 1 << 20, optimizations = ()):
+    patitoVM = PatitoVirtualMachine(optimizations=optimizations, output=PatitoOutput())
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaded = patitoVM.load(source)
+    if not loaded:
+        raise PatitoCompileError(patitoVM.error)
+    patitoVM.create_memory_vars()
+    patitoVM.trace = TraceWriter(path, capacity)
+    try:
+        patitoVM.run_engine('trace')
+    finally:
+        patitoVM.trace.close()
+    return patitoVM.trace.count
+
+# Print the analysis of a trace
+def print_report(path, top = 10):
+    reader = TraceReader(path)
+    print('RECORDS: ' + str(len(reader)) + ' of ' + str(reader.count))
+    print('\n')
+    print('BRANCHES')
+    branches = reader.branch_ratios()
+    print(tabulate([[branch['quad'], branch['operation'], branch['executed'], branch['taken'], '%.1f%%' % (branch['ratio'] * 100)] for branch in branches],
+                   headers=['quad', 'operation', 'executed', 'taken', 'ratio'], tablefmt='grid'))
+    print('\n')
+    print('LOOPS')
+    loops = reader.trip_counts()
+    print(tabulate([[loop['start'], loop['end'], loop['runs'], loop['min'], '-' if loop['mean'] is None else '%.1f' % loop['mean'], loop['max']] for loop in loops],
+                   headers=['start', 'end', 'runs', 'min trips', 'mean trips', 'max trips'], tablefmt='grid'))
+    print('\n')
+    print('HOT PATHS')
+    paths = reader.hot_paths(top)
+    print(tabulate([[path['start'], path['end'], path['branches'], path['count'], '%.1f%%' % (path['share'] * 100)] for path in paths],
+                   headers=['start', 'end', 'branches', 'count', 'share'], tablefmt='grid'))
+    reader.close()
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Record and analyze traces of Patito programs')
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+    record_parser = subparsers.add_parser('record', help='run a program writing its trace')
+    record_parser.add_argument('program')
+    record_parser.add_argument('-o', '--output', required=True)
+    record_parser.add_argument('--capacity', type=int, default=1 << 20, help='number of records kept, the oldest ones are overwritten')
+    record_parser.add_argument('--optimize', action='append', choices=PatitoOptimizer.passes, default=[], help='optimization pass to apply (can be repeated)')
+    report_parser = subparsers.add_parser('report', help='analyze a trace')
+    report_parser.add_argument('trace')
+    report_parser.add_argument('--top', type=int, default=10, help='number of hot paths')
+    args = arg_parser.parse_args()
+
+    if args.command == 'record':
+        if args.capacity < 1:
+            record_parser.error('--capacity must be at least 1')
+        try:
+            count = record(read_file(args.program), args.output, args.capacity, args.optimize)
+        except PatitoCompileError as e:
+            print('Error in Compiler\n', e.error)
+        else:
+            print(str(count) + ' quads traced, ' + str(os.path.getsize(args.output)) + ' bytes')
+    else:
+        print_report(args.trace, args.top)
@@ -0,0 +1,421 @@
+# ------------------------------------------------------------
+# PatitoTranspiler.py
+#
+# Ahead of time translation of a linked program in Patito Language to
+# the source of a Python function, compiled once and run as native code
+#
+# The quads are translated to structured code:
+#   loops      a jump back to a quad is a 'while True' loop over the quads
+#              from its target, that breaks when the jump is not taken
+#   if / else  a jump forward is an 'if' over the quads it skips. If the
+#              last of them is a GoTo forward it's the end of the 'then'
+#              and the quads it skips are the 'else'. An 'else' that is
+#              only another condition is written as 'elif'.
+#   break      a jump to the quad after the loop
+# Programs that can't be structured (jumps into the middle of a block)
+# are translated to a loop that selects the basic block of the program
+# counter. Variables and temporals are locals of the function and the
+# constants are literals.
+#
+# The blocks engine (BlockTranspiler and transpile_blocks) uses a function
+# for every basic block of PatitoCFG instead, that reads and writes the
+# memory and returns the first quad of the next block.
+# ------------------------------------------------------------
+
+import argparse
+import contextlib
+import io
+import math
+from PatitoCFG import PatitoCFG, leaders
+from PatitoParser import JUMPS, SEGMENTS
+
+# Operator of every arithmetic and relational operation
+OPERATORS = {'+': '+', '-': '-', '*': '*', '/': '/', '>': '>', '<': '<', '!=': '!='}
+
+# Comparison of every fused jump
+FUSED_JUMPS = {'GoToV>': '>', 'GoToV<': '<', 'GoToV!=': '!=', 'GoToF>': '>', 'GoToF<': '<', 'GoToF!=': '!='}
+
+# Name of the generated function
+FUNCTION_NAME = 'patito_program'
+
+class Unstructured(Exception):
+
+    def __init__(self, program_counter):
+        Exception.__init__(self, 'Jump of quad ' + str(program_counter) + ' is not structured')
+        self.program_counter = program_counter
+
+class TranspiledProgram(object):
+
+    def __init__(self, source, function, structured):
+        # Python source of the program
+        self.source = source
+        # function(memory, write, check, executed) runs the program on a memory. write
+        # prints a text, check(program_counter, executed_quads) is called when a loop
+        # jumps back (None to run without limits) and executed[0] gets the number of quads.
+        self.function = function
+        # False if the program is run by basic blocks because it could not be structured
+        self.structured = structured
+
+    def __call__(self, memory, write, check = None, executed = None):
+        if executed is None:
+            executed = [0]
+        return self.function(memory, write, check, executed)
+
+class PatitoTranspiler(object):
+
+    def __init__(self, code, memory_const, count_memory):
+        self.code = code
+        self.memory_const = memory_const
+        # Indexes of the memory below it are constants
+        self.constants = len(memory_const)
+        # Indexes of the temporals of bool type, that can be used as conditions directly
+        start = sum(count_memory.get(segment, 0) for segment in SEGMENTS[:-1])
+        self.bools = range(start, start + count_memory.get('temp_bool', 0))
+        # Quads that jump back to every quad
+        self.back_edges = {}
+        for program_counter, (operation, operand1, operand2, target) in enumerate(code):
+            if operation in JUMPS and target <= program_counter:
+                self.back_edges.setdefault(target, []).append(program_counter)
+
+    # Generate the source of the function
+    def transpile(self):
+        structured = True
+        try:
+            self.reset()
+            self.emit_block(self.structure(0, len(self.code)), 2)
+            source = self.function_source()
+            # Python limits how deep blocks can be nested
+            compile(source, '<patito>', 'exec')
+        except (Unstructured, RecursionError, SyntaxError):
+            structured = False
+            self.reset()
+            self.emit_dispatch(2)
+            source = self.function_source()
+        return source, structured
+
+    def reset(self):
+        self.lines = []
+        # Memory indexes of the locals
+        self.locals = set()
+
+    def emit(self, depth, text):
+        self.lines.append('    ' * depth + text)
+
+    # Function with the locals loaded from the memory and written back when it ends
+    def function_source(self):
+        names = sorted(self.locals)
+        lines = ['def ' + FUNCTION_NAME + '(memory, write, check, executed):', '    q = 0']
+        lines += ['    m%d = memory[%d]' % (index, index) for index in names]
+        lines += ['    try:']
+        lines += self.lines
+        lines += ['    finally:']
+        lines += ['        memory[%d] = m%d' % (index, index) for index in names]
+        lines += ['        executed[0] = q', '    return q', '']
+        return '\n'.join(lines)
+
+    # Expression of the value of a memory index: a literal for constants and a local otherwise
+    def value(self, index):
+        if index < self.constants:
+            constant = self.memory_const[index]
+            if type(constant) in (int, str, bool) or (type(constant) is float and math.isfinite(constant)):
+                if type(constant) is not str and constant < 0:
+                    return '(' + repr(constant) + ')'
+                return repr(constant)
+            return 'memory[%d]' % index
+        self.locals.add(index)
+        return 'm%d' % index
+
+    # Python code of a quad that is not a jump
+    def emit_quad(self, program_counter, depth):
+        operation, operand1, operand2, result = self.code[program_counter]
+        if operation == '=':
+            self.emit(depth, self.value(result) + ' = ' + self.value(operand2))
+        elif operation == '-' and operand1 is None:
+            # Without left operand it's a change of symbol
+            self.emit(depth, self.value(result) + ' = - ' + self.value(operand2))
+        elif operation in OPERATORS:
+            self.emit(depth, self.value(result) + ' = ' + self.value(operand1) + ' ' + OPERATORS[operation] + ' ' + self.value(operand2))
+        elif operation == 'cout':
+            endings = {'line_break': '\n', 'blank_space': ' '}
+            if operand2 < self.constants and self.memory_const[operand2] in endings:
+                ending = endings[self.memory_const[operand2]]
+                if operand1 < self.constants:
+                    self.emit(depth, 'write(' + repr(str(self.memory_const[operand1]) + ending) + ')')
+                else:
+                    self.emit(depth, 'write(str(' + self.value(operand1) + ') + ' + repr(ending) + ')')
+            else:
+                # Print different depending if it's a line break or a line space after
+                for keyword, (separator, ending) in zip(('if', 'elif'), endings.items()):
+                    self.emit(depth, keyword + ' ' + self.value(operand2) + ' == ' + repr(separator) + ':')
+                    self.emit(depth + 1, 'write(str(' + self.value(operand1) + ') + ' + repr(ending) + ')')
+        else:
+            raise ValueError('Operation ' + str(operation) + ' does not exist')
+
+    # Condition that is true when the jump of a quad is taken (or not taken)
+    def condition(self, program_counter, taken = True):
+        operation, operand1, operand2, target = self.code[program_counter]
+        if operation == 'GoTo':
+            return 'True' if taken else 'False'
+        if operation in FUSED_JUMPS:
+            comparison = self.value(operand1) + ' ' + FUSED_JUMPS[operation] + ' ' + self.value(operand2)
+            if (operation[4] == 'V') == taken:
+                return comparison
+            return 'not ' + comparison
+        value = self.value(operand2)
+        jump_if = operation == 'GoToV'
+        if operand2 in self.bools:
+            return value if jump_if == taken else 'not ' + value
+        # Other values jump only if they are equal to the bool, like the other engines
+        return value + (' == ' if taken else ' != ') + str(jump_if)
+
+    # Structure the quads from start to end (the quad where the region continues) as a
+    # list of nodes: ('quad', pc), ('break', pc), ('loop', start, back_edge, body) and
+    # ('if', pc, then, else). exit is the quad after the loop the region is in.
+    def structure(self, start, end, exit = None):
+        nodes = []
+        program_counter = start
+        while program_counter < end:
+            # A loop starts at a quad with jumps back to it, its body ends at the last one
+            back_edge = max((source for source in self.back_edges.get(program_counter, ()) if source < end), default=None)
+            if back_edge is not None:
+                nodes.append(('loop', program_counter, back_edge, self.structure(program_counter, back_edge, back_edge + 1)))
+                program_counter = back_edge + 1
+                continue
+
+            operation, operand1, operand2, target = self.code[program_counter]
+            if operation not in JUMPS:
+                nodes.append(('quad', program_counter))
+                program_counter += 1
+                continue
+            if target == exit:
+                nodes.append(('break', program_counter))
+                program_counter += 1
+                continue
+            if operation == 'GoTo' or target <= program_counter or target > end:
+                raise Unstructured(program_counter)
+
+            # The quads skipped by the jump are the 'then'
+            then_end = target
+            else_end = None
+            if target - 1 > program_counter:
+                last_operation, _, _, last_target = self.code[target - 1]
+                if last_operation == 'GoTo' and target <= last_target <= end:
+                    then_end = target - 1
+                    else_end = last_target
+            then = self.structure(program_counter + 1, then_end, exit)
+            otherwise = None
+            if else_end is not None:
+                otherwise = self.structure(target, else_end, exit)
+            nodes.append(('if', program_counter, then, otherwise))
+            program_counter = target if else_end is None else else_end
+        return nodes
+
+    # Emit the nodes of a block. Quads are counted once for every run of quads without
+    # jumps: before adds quads at the start of the block and after at its end.
+    def emit_block(self, nodes, depth, before = 0, after = 0):
+        first_line = len(self.lines)
+        pending = before
+        index = 0
+        while True:
+            run = []
+            while index < len(nodes) and nodes[index][0] == 'quad':
+                run.append(nodes[index][1])
+                index += 1
+            node = nodes[index] if index < len(nodes) else None
+            count = len(run) + pending
+            if node is None:
+                count += after
+            elif node[0] != 'loop':
+                # The jump of the node is part of the run
+                count += 1
+            pending = 0
+            if count:
+                self.emit(depth, 'q += %d' % count)
+            for program_counter in run:
+                self.emit_quad(program_counter, depth)
+            if node is None:
+                break
+            index += 1
+
+            if node[0] == 'break':
+                if self.code[node[1]][0] == 'GoTo':
+                    self.emit(depth, 'break')
+                else:
+                    self.emit(depth, 'if ' + self.condition(node[1]) + ':')
+                    self.emit(depth + 1, 'break')
+            elif node[0] == 'loop':
+                self.emit_loop(node, depth)
+            else:
+                self.emit_if(node, depth)
+
+        if len(self.lines) == first_line:
+            self.emit(depth, 'pass')
+
+    def emit_loop(self, node, depth):
+        _, _, back_edge, body = node
+        self.emit(depth, 'while True:')
+        # The jump back is counted with the last quads of the body
+        self.emit_block(body, depth + 1, after=1)
+        if self.code[back_edge][0] != 'GoTo':
+            self.emit(depth + 1, 'if ' + self.condition(back_edge, False) + ':')
+            self.emit(depth + 2, 'break')
+        # Limits are checked only when a loop jumps back
+        self.emit(depth + 1, 'if check is not None:')
+        self.emit(depth + 2, 'check(%d, q)' % back_edge)
+
+    def emit_if(self, node, depth):
+        _, program_counter, then, otherwise = node
+        keyword = 'if'
+        condition = self.condition(program_counter, False)
+        # Quads executed to get to the current branch of an elif
+        before = 0
+        while True:
+            self.emit(depth, keyword + ' ' + condition + ':')
+            # The GoTo at the end of the 'then' is counted in it
+            self.emit_block(then, depth + 1, before, 0 if otherwise is None else 1)
+            if otherwise is None:
+                return
+            chained = self.elif_condition(otherwise)
+            if chained is None:
+                break
+            count, condition, (_, program_counter, then, otherwise) = chained
+            before += count
+            keyword = 'elif'
+        self.emit(depth, 'else:')
+        self.emit_block(otherwise, depth + 1, before)
+
+    # If an 'else' is only an 'if' (and the quad that calculates its condition) get the number
+    # of quads before the branches, the condition and the 'if'. Returns None otherwise.
+    def elif_condition(self, nodes):
+        if len(nodes) == 1 and nodes[0][0] == 'if':
+            return 1, self.condition(nodes[0][1], False), nodes[0]
+        if len(nodes) != 2 or nodes[0][0] != 'quad' or nodes[1][0] != 'if':
+            return None
+        operation, operand1, operand2, result = self.code[nodes[0][1]]
+        jump, _, condition, _ = self.code[nodes[1][1]]
+        if operation not in OPERATORS or operand1 is None or jump not in ('GoToV', 'GoToF') or condition != result or result not in self.bools:
+            return None
+        # The temporal keeps its value like in the other engines
+        assignment = '(' + self.value(result) + ' := ' + self.value(operand1) + ' ' + OPERATORS[operation] + ' ' + self.value(operand2) + ')'
+        return 2, assignment if jump == 'GoToF' else 'not ' + assignment, nodes[1]
+
+    # Emit a loop that runs the basic block of the program counter, for programs that can't be structured
+    def emit_dispatch(self, depth):
+        size = len(self.code)
+        starts = sorted(leaders(self.code))
+
+        self.emit(depth, 'pc = 0')
+        self.emit(depth, 'while True:')
+        for number, leader in enumerate(starts):
+            end = starts[number + 1] if number + 1 < len(starts) else size
+            self.emit(depth + 1, ('if' if number == 0 else 'elif') + ' pc == %d:' % leader)
+            block = depth + 2
+            self.emit(block, 'q += %d' % (end - leader))
+            for program_counter in range(leader, end - 1):
+                self.emit_quad(program_counter, block)
+            last = end - 1
+            operation, operand1, operand2, target = self.code[last]
+            if operation not in JUMPS:
+                self.emit_quad(last, block)
+                self.emit(block, 'pc = %d' % end)
+                continue
+            jump = block
+            if operation != 'GoTo':
+                self.emit(block, 'if ' + self.condition(last) + ':')
+                jump += 1
+            if target <= last:
+                # Limits are checked only when a loop jumps back
+                self.emit(jump, 'if check is not None:')
+                self.emit(jump + 1, 'check(%d, q)' % last)
+            self.emit(jump, 'pc = %d' % target)
+            if operation != 'GoTo':
+                self.emit(block, 'else:')
+                self.emit(block + 1, 'pc = %d' % end)
+        if starts:
+            self.emit(depth + 1, 'else:')
+            self.emit(depth + 2, 'break')
+        else:
+            self.emit(depth + 1, 'break')
+
+class TranspiledBlocks(object):
+
+    def __init__(self, source, factory, cfg):
+        # Python source of the blocks
+        self.source = source
+        # factory(memory, write) creates the function of every block bound to a memory
+        self.factory = factory
+        self.cfg = cfg
+
+    # Function, number of quads and last quad of the block that starts in every quad
+    # (None for quads in the middle of a block)
+    def bind(self, memory, write):
+        dispatch = [None] * len(self.cfg.quads)
+        for block, function in zip(self.cfg.blocks, self.factory(memory, write)):
+            dispatch[block.start] = (function, len(block), block.end - 1)
+        return dispatch
+
+class BlockTranspiler(PatitoTranspiler):
+
+    # Values of variables and temporals are read from the memory
+    def value(self, index):
+        if index < self.constants:
+            return PatitoTranspiler.value(self, index)
+        return 'memory[%d]' % index
+
+    # Generate the source of a function that creates the functions of every block
+    def transpile_blocks(self, cfg):
+        self.reset()
+        self.emit(0, 'def patito_blocks(memory, write):')
+        for block in cfg.blocks:
+            self.emit(1, 'def block_%d():' % block.number)
+            last = block.end - 1
+            operation, operand1, operand2, target = self.code[last]
+            for program_counter in range(block.start, last if operation in JUMPS else block.end):
+                self.emit_quad(program_counter, 2)
+            if operation == 'GoTo':
+                self.emit(2, 'return %d' % target)
+                continue
+            if operation in JUMPS:
+                self.emit(2, 'if ' + self.condition(last) + ':')
+                self.emit(3, 'return %d' % target)
+            self.emit(2, 'return %d' % block.end)
+        self.emit(1, 'return [' + ', '.join('block_%d' % block.number for block in cfg.blocks) + ']')
+        self.emit(0, '')
+        return '\n'.join(self.lines)
+
+# Translate a linked program to Python and compile it
+def transpile(code, memory_const, count_memory):
+    source, structured = PatitoTranspiler(code, memory_const, count_memory).transpile()
+    namespace = {}
+    exec(compile(source, '<patito>', 'exec'), namespace)
+    return TranspiledProgram(source, namespace[FUNCTION_NAME], structured)
+
+# Translate every basic block of a linked program to a Python function and compile them
+def transpile_blocks(code, memory_const, count_memory):
+    cfg = PatitoCFG(code)
+    source = BlockTranspiler(code, memory_const, count_memory).transpile_blocks(cfg)
+    namespace = {}
+    exec(compile(source, '<patito blocks>', 'exec'), namespace)
+    return TranspiledBlocks(source, namespace['patito_blocks'], cfg)
+
+
+if __name__ == '__main__':
+    # Imported here because the Virtual Machine uses this module
+    from PatitoOptimizer import PatitoOptimizer
+    from PatitoVirtualMachine import PatitoVirtualMachine, read_file
+
+    arg_parser = argparse.ArgumentParser(description='Print the Python source of a Patito program')
+    arg_parser.add_argument('program')
+    arg_parser.add_argument('--optimize', action='append', choices=PatitoOptimizer.passes, default=[], help='optimization pass to apply (can be repeated)')
+    arg_parser.add_argument('--blocks', action='store_true', help='print the functions of the basic blocks instead')
+    args = arg_parser.parse_args()
+
+    patitoVM = PatitoVirtualMachine(optimizations=args.optimize)
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaded = patitoVM.load(read_file(args.program))
+    if not loaded:
+        print('Error in Compiler\n', patitoVM.error)
+    elif args.blocks:
+        print(transpile_blocks(patitoVM.code, patitoVM.memory_const, patitoVM.count_memory).source, end='')
+    else:
+        print(transpile(patitoVM.code, patitoVM.memory_const, patitoVM.count_memory).source, end='')
@@ -5,31 +5,172 @@
 # ------------------------------------------------------------
 
 
-from PatitoParser import PatitoParser
+import argparse
+import time
+import PatitoBytecode
+import PatitoJIT
+import PatitoTranspiler
+from PatitoCache import PatitoCache
+from PatitoLimits import PatitoLimits
+from PatitoMemory import TypedMemory
+from PatitoOptimizer import PatitoOptimizer
+from PatitoOutput import file_output, stdout_output
+from PatitoParser import JUMPS, get_parser
+from PatitoTimings import PatitoTimings, measure
 
 class PatitoVirtualMachine(object):
-    def test(self, program, print_flag = False):
+    # Engines that can run a linked program
+    engines = ('loop', 'threaded', 'bytecode', 'blocks', 'python', 'jit')
+
+    # Ways to store the memory
+    memory_models = ('list', 'typed')
+
+    def __init__(self, cache = None, optimizations = (), memory_model = 'list', output = None, limits = None, timings = None):
+        # Cache of compiled programs (PatitoCache), None to always compile
+        self.cache = cache
+        # Passes of PatitoOptimizer applied after compiling
+        self.optimizations = optimizations
+        self.optimization_stats = {}
+        # 'list' stores every value in one list, 'typed' uses a typed array per segment
+        self.memory_model = memory_model
+        # Where the programs print (PatitoOutput), None for the standard output
+        self.output = output
+        # Limits of every run (PatitoLimits), None to run without limits
+        self.limits = limits
+        # Timings of the phases of the compiler and the Virtual Machine (PatitoTimings)
+        self.timings = timings
+        # Writer of the trace used by the trace engine (PatitoTrace.TraceWriter)
+        self.trace = None
+
+    # Compile a program (or get it from the cache). Returns False if the program has errors.
+    def load(self, program, print_flag = False):
         self.error = ''
-        try:
-            # Create parser
-            parser = PatitoParser()
+        compiled = None
+        if self.cache is not None:
+            with measure(self.timings, 'cache'):
+                compiled = self.cache.get(program)
+
+        if compiled is not None:
+            # Skip the compiler if the program is in the cache
+            self.quadruples, self.constants_table, self.symbol_table, self.memory_const, self.count_memory, self.memory_directions, self.quad_lines = compiled
+        else:
+            # Get the parser shared by the process
+            parser = get_parser()
             # Get important information from the compiler
-            self.quadruples, self.constants_table, self.symbol_table, self.memory_const, self.count_memory, self.memory_directions, self.error = parser.parse(program, print_flag)
+            parser.timings = self.timings
+            try:
+                compiled = parser.parse(program, print_flag)
+            finally:
+                parser.timings = None
+            if compiled is None:
+                # The compiler stopped at the error
+                self.error = parser.error
+                return False
+            self.quadruples, self.constants_table, self.symbol_table, self.memory_const, self.count_memory, self.memory_directions, self.error = compiled
+            # Line of the source of every quad
+            self.quad_lines = list(parser.quad_lines)
             ## Print error
             if self.error != '':
+                return False
+
+            if self.cache is not None:
+                self.cache.put(program, (self.quadruples, self.constants_table, self.symbol_table, self.memory_const, self.count_memory, self.memory_directions, self.quad_lines))
+
+        if self.optimizations:
+            with measure(self.timings, 'optimize'):
+                self.optimize(print_flag)
+
+        with measure(self.timings, 'link'):
+            self.link()
+        return True
+
+    # Apply the optimization passes to the compiled program
+    def optimize(self, print_flag = False):
+        optimizer = PatitoOptimizer(self.quadruples, self.constants_table, self.symbol_table, self.memory_const, self.count_memory, self.memory_directions, self.quad_lines)
+        optimizer.optimize(self.optimizations)
+        self.quadruples = optimizer.quadruples
+        self.quad_lines = optimizer.lines
+        self.constants_table = optimizer.constants_table
+        self.symbol_table = optimizer.symbol_table
+        self.memory_const = optimizer.memory_const
+        self.count_memory = optimizer.count_memory
+        self.memory_directions = optimizer.memory_directions
+        self.optimization_stats = optimizer.stats
+        if print_flag:
+            optimizer.print_stats()
+
+    def test(self, program, print_flag = False, engine = 'loop'):
+        self.error = ''
+        if self.timings is not None:
+            self.timings.reset()
+        try:
+            if not self.load(program, print_flag):
                 return
             
             try:
                 # Create memory and run program
-                self.memory = self.create_memory_vars()
-                self.execute()
+                with measure(self.timings, 'create memory'):
+                    self.memory = self.create_memory_vars()
+                captured = self.run_engine(engine)
                 # Print memory
                 self.print_memory()
+                if self.timings is not None:
+                    self.timings.print_report()
+                return captured
             except Exception as e:
                 print('Error in Virtual Machine ', e)
         except Exception as e:
             print('Error in Compiler\n', self.error)
 
+    # Run the linked program with the selected engine. Returns the output if it's captured.
+    def run_engine(self, engine = 'loop'):
+        self.sink = self.output if self.output is not None else stdout_output()
+        self.start_limits()
+        try:
+            with measure(self.timings, 'execute'):
+                if engine == 'loop':
+                    self.execute()
+                elif engine == 'threaded':
+                    self.execute_threaded()
+                elif engine == 'bytecode':
+                    if self.bytecode is None:
+                        self.bytecode = PatitoBytecode.encode(self.code)
+                    self.execute_bytecode(self.bytecode)
+                elif engine == 'blocks':
+                    if self.blocks is None:
+                        self.blocks = PatitoTranspiler.transpile_blocks(self.code, self.memory_const, self.count_memory)
+                    self.execute_blocks(self.blocks)
+                elif engine == 'python':
+                    if self.transpiled is None:
+                        self.transpiled = PatitoTranspiler.transpile(self.code, self.memory_const, self.count_memory)
+                    self.execute_transpiled(self.transpiled)
+                elif engine == 'jit':
+                    # Traces are bound to the memory of the run, they are compiled again every run
+                    self.jit = PatitoJIT.PatitoJIT(self)
+                    self.jit.run()
+                elif engine == 'profile':
+                    self.execute_profiled()
+                elif engine == 'trace':
+                    self.execute_traced(self.trace)
+                else:
+                    raise ValueError('Engine ' + str(engine) + ' does not exist')
+        finally:
+            # Print what is left in the buffer also when the program fails
+            self.sink.flush()
+        return self.sink.getvalue()
+
+    # Start the time of the run and check the limits that do not change while it runs
+    def start_limits(self):
+        self.start_time = time.perf_counter()
+        self.deadline = None
+        if self.limits is not None:
+            self.limits.check_memory(self.memory)
+            self.deadline = self.limits.deadline(self.start_time)
+
+    # Stop the run if it went over a limit. It's only called when a loop jumps back.
+    def check_limits(self, program_counter, executed):
+        self.limits.check(program_counter, executed, self.start_time, self.deadline)
+
     # Print memory
     def print_memory(self):
         print("\nMEMORY")
@@ -38,84 +179,471 @@ class PatitoVirtualMachine(object):
         
     # Create memory (an array with the size of all the counters)
     def create_memory_vars(self):
+        if self.memory_model == 'typed':
+            self.memory = TypedMemory(self.memory_const, self.count_memory)
+            return self.memory
+
         size = (self.count_memory['var_int'] + self.count_memory['var_float'] + self.count_memory['temp_int'] + self.count_memory['temp_float'] + self.count_memory['temp_bool'])
         self.memory = self.memory_const + [None for _ in range(size)]
         return self.memory
 
+    # Compute where every segment starts inside the memory array
+    def compute_segment_offsets(self):
+        self.segment_offsets = {}
+        offset = 0
+        for segment in self.memory_directions:
+            self.segment_offsets[segment] = offset
+            offset += self.count_memory[segment]
+        return self.segment_offsets
+
     # Find memory in the memory array
     def find_dir_in_memory(self, find_dir):
         if find_dir != None:
-            count_memory_values = list(self.count_memory.values())
-            if find_dir >= self.memory_directions['const_int'] and find_dir < self.memory_directions['const_float']:
-                index = find_dir - self.memory_directions['const_int']
-            elif find_dir >= self.memory_directions['const_float'] and find_dir < self.memory_directions['const_strings']:
-                index = count_memory_values[0] + (find_dir - self.memory_directions['const_float'])
-            elif find_dir >= self.memory_directions['const_strings'] and find_dir < self.memory_directions['var_int']:
-                index = sum(count_memory_values[0:2]) + (find_dir - self.memory_directions['const_strings'])
-            elif find_dir >= self.memory_directions['var_int'] and find_dir < self.memory_directions['var_float']:
-                index = sum(count_memory_values[0:3]) + (find_dir - self.memory_directions['var_int'])
-            elif find_dir >= self.memory_directions['var_float'] and find_dir < self.memory_directions['temp_int']:
-                index = sum(count_memory_values[0:4]) + (find_dir - self.memory_directions['var_float'])
-            elif find_dir >= self.memory_directions['temp_int'] and find_dir < self.memory_directions['temp_float']:
-                index = sum(count_memory_values[0:5]) + (find_dir - self.memory_directions['temp_int'])
-            elif find_dir >= self.memory_directions['temp_float'] and find_dir < self.memory_directions['temp_bool']:
-                index = sum(count_memory_values[0:6]) + (find_dir - self.memory_directions['temp_float'])
-            elif find_dir >= self.memory_directions['temp_bool'] and find_dir < self.memory_directions['temp_bool'] + 500:
-                index = sum(count_memory_values[0:7]) + (find_dir - self.memory_directions['temp_bool'])
+            # Look for the last segment that starts before the direction
+            index = None
+            for segment, start in self.memory_directions.items():
+                if find_dir >= start:
+                    index = self.segment_offsets[segment] + (find_dir - start)
             return index
+
+    # Link the program: rewrite every quad once with indexes of the memory array
+    # so the execution loop does not translate directions on every iteration
+    def link(self):
+        self.compute_segment_offsets()
+        # Encoded code for the bytecode engine, created when it's used
+        self.bytecode = None
+        # Program translated to Python for the python engine, created when it's used
+        self.transpiled = None
+        # Functions of the basic blocks for the blocks engine, created when they're used
+        self.blocks = None
+        self.code = []
+        for operation, operand1, operand2, result in self.quadruples:
+            index_operand1 = self.find_dir_in_memory(operand1)
+            index_operand2 = self.find_dir_in_memory(operand2)
+            # Jumps keep the number of the quad as result
+            if operation not in JUMPS:
+                result = self.find_dir_in_memory(result)
+            self.code.append((operation, index_operand1, index_operand2, result))
+        return self.code
     
     # Funtion that executes the program
     def execute(self):
+        memory = self.memory
+        write = self.sink.write
+        code = self.code
+        size = len(code)
         # Counter to know which quad to check
         program_counter = 0
+        # Number of quads executed
+        executed = 0
+        limited = self.limits is not None
 
         # Execute every quad
-        while program_counter < len(self.quadruples):
-            # Get quad
-            quad = self.quadruples[program_counter]
-            operation, operand1, operand2, result = quad
-            # Find indexes of the directions in memory
-            index_operand1 = self.find_dir_in_memory(operand1)
-            index_operand2 = self.find_dir_in_memory(operand2)
-            index_result = self.find_dir_in_memory(result)
-
-            # Switch for every tipe of operation
-            if operation == '+':
-                self.memory[index_result] = self.memory[index_operand1] + self.memory[index_operand2]
-            if operation == '-':
-                if self.memory[index_operand1] == None:
-                    self.memory[index_result] = - self.memory[index_operand2]
-                else:
-                    self.memory[index_result] = self.memory[index_operand1] - self.memory[index_operand2]
-            if operation == '*':
-                self.memory[index_result] = self.memory[index_operand1] * self.memory[index_operand2]
-            if operation == '/':
-                self.memory[index_result] = self.memory[index_operand1] / self.memory[index_operand2]
-            if operation == '>':
-                self.memory[index_result] = self.memory[index_operand1] > self.memory[index_operand2]
-            if operation == '<':
-                self.memory[index_result] = self.memory[index_operand1] < self.memory[index_operand2]
-            if operation == '!=':
-                self.memory[index_result] = self.memory[index_operand1] != self.memory[index_operand2]
-            if operation == '=':
-                self.memory[index_result] = self.memory[index_operand2]
-            if operation == 'cout':
-                # Print different depending if it's a line break or a line space after
-                if self.memory[index_operand2] == 'line_break':
-                    print(self.memory[index_operand1])
-                elif self.memory[index_operand2] == 'blank_space':
-                    print(self.memory[index_operand1], end=" ")
-            # GoTos move the program counter to the quad of the jump
-            if operation == 'GoTo':
-                program_counter = result - 1
-            if operation == 'GoToV':
-                if self.memory[index_operand2] == True:
-                    program_counter = result - 1
-            if operation == 'GoToF':
-                if self.memory[index_operand2] == False:
-                    program_counter = result - 1
+        try:
+            while program_counter < size:
+                executed += 1
+                # Get linked quad
+                operation, index_operand1, index_operand2, index_result = code[program_counter]
+
+                # Switch for every tipe of operation
+                if operation == '=':
+                    memory[index_result] = memory[index_operand2]
+                elif operation == '+':
+                    memory[index_result] = memory[index_operand1] + memory[index_operand2]
+                elif operation == '-':
+                    # Without left operand it's a change of symbol
+                    if index_operand1 is None:
+                        memory[index_result] = - memory[index_operand2]
+                    else:
+                        memory[index_result] = memory[index_operand1] - memory[index_operand2]
+                elif operation == '*':
+                    memory[index_result] = memory[index_operand1] * memory[index_operand2]
+                elif operation == '/':
+                    memory[index_result] = memory[index_operand1] / memory[index_operand2]
+                elif operation == '>':
+                    memory[index_result] = memory[index_operand1] > memory[index_operand2]
+                elif operation == '<':
+                    memory[index_result] = memory[index_operand1] < memory[index_operand2]
+                elif operation == '!=':
+                    memory[index_result] = memory[index_operand1] != memory[index_operand2]
+                elif operation == 'cout':
+                    # Print different depending if it's a line break or a line space after
+                    if memory[index_operand2] == 'line_break':
+                        write(str(memory[index_operand1]) + '\n')
+                    elif memory[index_operand2] == 'blank_space':
+                        write(str(memory[index_operand1]) + ' ')
+                # GoTos move the program counter to the quad of the jump
+                # Limits are checked only when a loop jumps back
+                elif operation == 'GoTo':
+                    if limited and index_result <= program_counter:
+                        self.check_limits(program_counter, executed)
+                    program_counter = index_result - 1
+                elif operation == 'GoToV':
+                    if memory[index_operand2] == True:
+                        if limited and index_result <= program_counter:
+                            self.check_limits(program_counter, executed)
+                        program_counter = index_result - 1
+                elif operation == 'GoToF':
+                    if memory[index_operand2] == False:
+                        program_counter = index_result - 1
+                # Fused jumps compare the operands and jump depending on the result
+                elif operation == 'GoToF<':
+                    if not memory[index_operand1] < memory[index_operand2]:
+                        program_counter = index_result - 1
+                elif operation == 'GoToV<':
+                    if memory[index_operand1] < memory[index_operand2]:
+                        if limited and index_result <= program_counter:
+                            self.check_limits(program_counter, executed)
+                        program_counter = index_result - 1
+                elif operation == 'GoToF>':
+                    if not memory[index_operand1] > memory[index_operand2]:
+                        program_counter = index_result - 1
+                elif operation == 'GoToV>':
+                    if memory[index_operand1] > memory[index_operand2]:
+                        if limited and index_result <= program_counter:
+                            self.check_limits(program_counter, executed)
+                        program_counter = index_result - 1
+                elif operation == 'GoToF!=':
+                    if not memory[index_operand1] != memory[index_operand2]:
+                        program_counter = index_result - 1
+                elif operation == 'GoToV!=':
+                    if memory[index_operand1] != memory[index_operand2]:
+                        if limited and index_result <= program_counter:
+                            self.check_limits(program_counter, executed)
+                        program_counter = index_result - 1
             
-            program_counter += 1
+                program_counter += 1
+        finally:
+            self.executed_quads = executed
+
+    # Create the handler of a linked quad. Every handler is a closure with
+    # its indexes already bound and returns the next program counter.
+    def make_handler(self, program_counter, quad):
+        memory = self.memory
+        write = self.sink.write
+        operation, index_operand1, index_operand2, index_result = quad
+        next_quad = program_counter + 1
+
+        if operation == '=':
+            def handler():
+                memory[index_result] = memory[index_operand2]
+                return next_quad
+        elif operation == '+':
+            def handler():
+                memory[index_result] = memory[index_operand1] + memory[index_operand2]
+                return next_quad
+        elif operation == '-' and index_operand1 is None:
+            def handler():
+                memory[index_result] = - memory[index_operand2]
+                return next_quad
+        elif operation == '-':
+            def handler():
+                memory[index_result] = memory[index_operand1] - memory[index_operand2]
+                return next_quad
+        elif operation == '*':
+            def handler():
+                memory[index_result] = memory[index_operand1] * memory[index_operand2]
+                return next_quad
+        elif operation == '/':
+            def handler():
+                memory[index_result] = memory[index_operand1] / memory[index_operand2]
+                return next_quad
+        elif operation == '>':
+            def handler():
+                memory[index_result] = memory[index_operand1] > memory[index_operand2]
+                return next_quad
+        elif operation == '<':
+            def handler():
+                memory[index_result] = memory[index_operand1] < memory[index_operand2]
+                return next_quad
+        elif operation == '!=':
+            def handler():
+                memory[index_result] = memory[index_operand1] != memory[index_operand2]
+                return next_quad
+        elif operation == 'cout':
+            def handler():
+                # Print different depending if it's a line break or a line space after
+                if memory[index_operand2] == 'line_break':
+                    write(str(memory[index_operand1]) + '\n')
+                elif memory[index_operand2] == 'blank_space':
+                    write(str(memory[index_operand1]) + ' ')
+                return next_quad
+        elif operation == 'GoTo':
+            def handler():
+                return index_result
+        elif operation == 'GoToV':
+            def handler():
+                if memory[index_operand2] == True:
+                    return index_result
+                return next_quad
+        elif operation == 'GoToF':
+            def handler():
+                if memory[index_operand2] == False:
+                    return index_result
+                return next_quad
+        elif operation == 'GoToF<':
+            def handler():
+                if not memory[index_operand1] < memory[index_operand2]:
+                    return index_result
+                return next_quad
+        elif operation == 'GoToV<':
+            def handler():
+                if memory[index_operand1] < memory[index_operand2]:
+                    return index_result
+                return next_quad
+        elif operation == 'GoToF>':
+            def handler():
+                if not memory[index_operand1] > memory[index_operand2]:
+                    return index_result
+                return next_quad
+        elif operation == 'GoToV>':
+            def handler():
+                if memory[index_operand1] > memory[index_operand2]:
+                    return index_result
+                return next_quad
+        elif operation == 'GoToF!=':
+            def handler():
+                if not memory[index_operand1] != memory[index_operand2]:
+                    return index_result
+                return next_quad
+        elif operation == 'GoToV!=':
+            def handler():
+                if memory[index_operand1] != memory[index_operand2]:
+                    return index_result
+                return next_quad
+        else:
+            raise ValueError('Operation ' + str(operation) + ' does not exist')
+
+        return handler
+
+    # Create the handlers of every quad bound to the current memory and output
+    def thread(self):
+        return [self.make_handler(program_counter, quad) for program_counter, quad in enumerate(self.code)]
+
+    # Function that executes the program with closure-threaded code. The
+    # operation of every quad is resolved only once when handlers are created.
+    def execute_threaded(self):
+        handlers = self.thread()
+        size = len(handlers)
+        program_counter = 0
+        # Number of quads executed
+        executed = 0
+
+        try:
+            if self.limits is None:
+                while program_counter < size:
+                    executed += 1
+                    program_counter = handlers[program_counter]()
+            else:
+                while program_counter < size:
+                    executed += 1
+                    next_quad = handlers[program_counter]()
+                    # Limits are checked only when a loop jumps back
+                    if next_quad <= program_counter:
+                        self.check_limits(program_counter, executed)
+                    program_counter = next_quad
+        finally:
+            self.executed_quads = executed
+
+    # Function that executes the program counting the executions and the time of every
+    # quad. It's a different loop so the other engines don't pay for the measures.
+    def execute_profiled(self):
+        handlers = self.thread()
+        size = len(handlers)
+        self.quad_counts = counts = [0] * size
+        self.quad_times = times = [0.0] * size
+        clock = time.perf_counter
+        program_counter = 0
+        # Number of quads executed
+        executed = 0
+        limited = self.limits is not None
+
+        try:
+            while program_counter < size:
+                executed += 1
+                start = clock()
+                next_quad = handlers[program_counter]()
+                times[program_counter] += clock() - start
+                counts[program_counter] += 1
+                # Limits are checked only when a loop jumps back
+                if limited and next_quad <= program_counter:
+                    self.check_limits(program_counter, executed)
+                program_counter = next_quad
+        finally:
+            self.executed_quads = executed
+
+    # Function that executes the program writing a record of every quad in a trace:
+    # the value written by the quad, or if a jump was taken. It's a different loop
+    # so the other engines don't pay for the trace.
+    def execute_traced(self, trace):
+        handlers = self.thread()
+        memory = self.memory
+        append = trace.append
+        size = len(handlers)
+        opcodes = [PatitoBytecode.OPCODES[quad[0]] for quad in self.code]
+        jumps = [quad[0] in JUMPS for quad in self.code]
+        # Index of the result in memory, target quad of jumps and -1 for prints
+        results = [-1 if quad[0] == 'cout' else quad[3] for quad in self.code]
+        program_counter = 0
+        # Number of quads executed
+        executed = 0
+        limited = self.limits is not None
+
+        try:
+            while program_counter < size:
+                executed += 1
+                next_quad = handlers[program_counter]()
+                result = results[program_counter]
+                if jumps[program_counter]:
+                    append(program_counter, opcodes[program_counter], result, next_quad != program_counter + 1)
+                    # Limits are checked only when a loop jumps back
+                    if limited and next_quad <= program_counter:
+                        self.check_limits(program_counter, executed)
+                elif result >= 0:
+                    append(program_counter, opcodes[program_counter], result, memory[result])
+                else:
+                    append(program_counter, opcodes[program_counter], result)
+                program_counter = next_quad
+        finally:
+            self.executed_quads = executed
+
+    # Function that executes the code of a bytecode: a flat sequence of
+    # integers with 4 values per quad (opcode, operand1, operand2, result)
+    def execute_bytecode(self, code):
+        memory = self.memory
+        write = self.sink.write
+        size = len(code)
+        # Position of the opcode of the current quad
+        position = 0
+        # Number of quads executed
+        executed = 0
+        limited = self.limits is not None
+
+        try:
+            while position < size:
+                executed += 1
+                operation = code[position]
+
+                if operation == 0:
+                    memory[code[position + 3]] = memory[code[position + 2]]
+                elif operation == 1:
+                    memory[code[position + 3]] = memory[code[position + 1]] + memory[code[position + 2]]
+                elif operation == 2:
+                    # Without left operand it's a change of symbol
+                    if code[position + 1] < 0:
+                        memory[code[position + 3]] = - memory[code[position + 2]]
+                    else:
+                        memory[code[position + 3]] = memory[code[position + 1]] - memory[code[position + 2]]
+                elif operation == 3:
+                    memory[code[position + 3]] = memory[code[position + 1]] * memory[code[position + 2]]
+                elif operation == 4:
+                    memory[code[position + 3]] = memory[code[position + 1]] / memory[code[position + 2]]
+                elif operation == 5:
+                    memory[code[position + 3]] = memory[code[position + 1]] > memory[code[position + 2]]
+                elif operation == 6:
+                    memory[code[position + 3]] = memory[code[position + 1]] < memory[code[position + 2]]
+                elif operation == 7:
+                    memory[code[position + 3]] = memory[code[position + 1]] != memory[code[position + 2]]
+                elif operation == 8:
+                    # Print different depending if it's a line break or a line space after
+                    if memory[code[position + 2]] == 'line_break':
+                        write(str(memory[code[position + 1]]) + '\n')
+                    elif memory[code[position + 2]] == 'blank_space':
+                        write(str(memory[code[position + 1]]) + ' ')
+                # GoTos move to the quad of the jump
+                # Limits are checked only when a loop jumps back
+                elif operation == 9:
+                    if limited and code[position + 3] * 4 <= position:
+                        self.check_limits(position // 4, executed)
+                    position = code[position + 3] * 4
+                    continue
+                elif operation == 10:
+                    if memory[code[position + 2]] == True:
+                        if limited and code[position + 3] * 4 <= position:
+                            self.check_limits(position // 4, executed)
+                        position = code[position + 3] * 4
+                        continue
+                elif operation == 11:
+                    if memory[code[position + 2]] == False:
+                        position = code[position + 3] * 4
+                        continue
+                # Fused jumps compare the operands and jump depending on the result
+                elif operation == 12:
+                    if memory[code[position + 1]] > memory[code[position + 2]]:
+                        if limited and code[position + 3] * 4 <= position:
+                            self.check_limits(position // 4, executed)
+                        position = code[position + 3] * 4
+                        continue
+                elif operation == 13:
+                    if memory[code[position + 1]] < memory[code[position + 2]]:
+                        if limited and code[position + 3] * 4 <= position:
+                            self.check_limits(position // 4, executed)
+                        position = code[position + 3] * 4
+                        continue
+                elif operation == 14:
+                    if memory[code[position + 1]] != memory[code[position + 2]]:
+                        if limited and code[position + 3] * 4 <= position:
+                            self.check_limits(position // 4, executed)
+                        position = code[position + 3] * 4
+                        continue
+                elif operation == 15:
+                    if not memory[code[position + 1]] > memory[code[position + 2]]:
+                        position = code[position + 3] * 4
+                        continue
+                elif operation == 16:
+                    if not memory[code[position + 1]] < memory[code[position + 2]]:
+                        position = code[position + 3] * 4
+                        continue
+                elif operation == 17:
+                    if not memory[code[position + 1]] != memory[code[position + 2]]:
+                        position = code[position + 3] * 4
+                        continue
+
+                position += 4
+        finally:
+            self.executed_quads = executed
+
+    # Function that executes a whole basic block for every dispatch. Every block is a
+    # function (PatitoTranspiler.transpile_blocks) that returns the first quad of the next one.
+    def execute_blocks(self, blocks):
+        dispatch = blocks.bind(self.memory, self.sink.write)
+        size = len(dispatch)
+        program_counter = 0
+        # Number of quads executed
+        executed = 0
+        limited = self.limits is not None
+
+        try:
+            while program_counter < size:
+                function, count, last = dispatch[program_counter]
+                executed += count
+                next_quad = function()
+                # Limits are checked only when a loop jumps back
+                if limited and next_quad <= last:
+                    self.check_limits(last, executed)
+                program_counter = next_quad
+        finally:
+            self.executed_quads = executed
+
+    # Function that executes the program translated to a Python function (PatitoTranspiler)
+    def execute_transpiled(self, transpiled):
+        executed = [0]
+        check = self.check_limits if self.limits is not None else None
+        try:
+            transpiled.function(self.memory, self.sink.write, check, executed)
+        finally:
+            self.executed_quads = executed[0]
+
+    # Run a bytecode loaded with PatitoBytecode.load
+    def run_bytecode(self, bytecode):
+        self.memory = bytecode.create_memory()
+        self.sink = self.output if self.output is not None else stdout_output()
+        self.start_limits()
+        try:
+            self.execute_bytecode(bytecode.code)
+        finally:
+            self.sink.flush()
+        return self.memory
 
 # Function to read file
 def read_file(file_path):
@@ -126,46 +654,75 @@ def read_file(file_path):
 
 
 if __name__ == '__main__':
-    patitoVM = PatitoVirtualMachine()
+    arg_parser = argparse.ArgumentParser(description='Run the Patito test programs')
+    arg_parser.add_argument('--engine', choices=PatitoVirtualMachine.engines, default='loop', help='engine used to execute the quads')
+    arg_parser.add_argument('--cache', metavar='DIR', help='directory to cache compiled programs')
+    arg_parser.add_argument('--optimize', action='append', choices=PatitoOptimizer.passes, default=[], help='optimization pass to apply (can be repeated)')
+    arg_parser.add_argument('--memory', choices=PatitoVirtualMachine.memory_models, default='list', help='how the memory of the program is stored')
+    arg_parser.add_argument('--output', metavar='FILE', help='write the output of the programs to a file')
+    arg_parser.add_argument('--max-quads', type=int, help='stop a program after executing this number of quads')
+    arg_parser.add_argument('--timeout', type=float, help='stop a program after this number of seconds')
+    arg_parser.add_argument('--max-memory', type=int, help='do not run a program with more values in memory')
+    arg_parser.add_argument('--timings', action='store_true', help='print the time and peak memory of every phase')
+    arg_parser.add_argument('--print', dest='print_flag', action='store_true', help='print the tables of the compiler')
+    args = arg_parser.parse_args()
+
+    cache = None
+    if args.cache:
+        cache = PatitoCache(args.cache)
+    output = None
+    if args.output:
+        output = file_output(args.output)
+    limits = None
+    if args.max_quads is not None or args.timeout is not None or args.max_memory is not None:
+        limits = PatitoLimits(args.max_quads, args.timeout, args.max_memory)
+    timings = None
+    if args.timings:
+        timings = PatitoTimings()
+        timings.start()
+    patitoVM = PatitoVirtualMachine(cache, args.optimize, args.memory, output, limits, timings)
 
     # Testcase with correct syntax and semantics
     print('\n')
     print('--------- FIBONNACCI AND FACTORIAL --------- ')
     data = read_file("testFibonacciFactorial.txt")
-    patitoVM.test(data)
+    patitoVM.test(data, args.print_flag, args.engine)
 
     # Testcase with condition 
     print('\n')
     print('--------- CONDITION TESTCASE (ELIF) --------- ')
     data = read_file("testCondition.txt")
-    patitoVM.test(data)
+    patitoVM.test(data, args.print_flag, args.engine)
     
     # Testcase with wrong syntax (error line 13, missing ;)
     print('\n\n')
     print('--------- INCORRECT SYNTAX TESTCASE --------- ')
     data = read_file("testSintaxisIncorrecta.txt")
-    patitoVM.test(data)
+    patitoVM.test(data, args.print_flag, args.engine)
 
     # Testcase with wrong semantics (use duplicated variable)
     print('\n\n')
     print('--------- INCORRECT SEMANTICS TESTCASE --------- ')
     data = read_file("testSemanticaIncorrecta.txt")
-    patitoVM.test(data)
+    patitoVM.test(data, args.print_flag, args.engine)
 
     # Testcase with operations 
     print('\n')
     print('--------- OPERATIONS TESTCASE --------- ')
     data = read_file("testOperations.txt")
-    patitoVM.test(data)
+    patitoVM.test(data, args.print_flag, args.engine)
 
     # Testcase with while 
     print('\n')
     print('--------- WHILE TESTCASE --------- ')
     data = read_file("testWhile.txt")
-    patitoVM.test(data)
+    patitoVM.test(data, args.print_flag, args.engine)
 
     # Testcase with print 
     print('\n')
     print('--------- PRINT TESTCASE --------- ')
     data = read_file("testPrint.txt")
-    patitoVM.test(data)
+    patitoVM.test(data, args.print_flag, args.engine)
+
+    if output is not None:
+        output.close()